@@ -30,7 +30,7 @@ function App() {
   const prevTranscriptCountRef = useRef(0);
   
   // Initialize WebSocket connection
-  const { messages, sendMessage, sendBinary, isConnected, clearMessages } = useWebSocket('ws://localhost:8766');
+  const { messages, feedbackDraft, prosody, streamStatus, sendMessage, sendBinary, isConnected, clearMessages } = useWebSocket('ws://localhost:8766');
 
   const startListening = async () => {
     if (isStreaming || !isConnected || !conversationTone) return;
@@ -84,6 +84,8 @@ function App() {
         user_intent: conversationTone,
         user_purpose: conversationPurpose,
         audience_type: audienceType,
+        feedback_stream: true,
+        protocol: 'delta',
       });
 
       setIsStreaming(true);
@@ -167,6 +169,16 @@ function App() {
     } catch {}
   }, [messages, aiFeedback, aiHasLoaded]);
 
+  // Show streamed feedback as it arrives; the final ai_feedback message replaces it
+  useEffect(() => {
+    const text = String((feedbackDraft && feedbackDraft.text) || '').trim();
+    if (!text) return;
+    setAiFeedback(text);
+    setAiFeedbackWords(text.split(/\s+/));
+    setAiAnimPhase('idle');
+    setAiHasLoaded(true);
+  }, [feedbackDraft]);
+
   // Log BS updates to console for visibility
   useEffect(() => {
     try {
@@ -346,6 +358,34 @@ function App() {
         <div className="panels-row">
           <section className="feedback-dashboard">
             <h2>Transcript & Voice Analysis</h2>
+            {streamStatus && streamStatus.degraded && (
+              <div className="stream-status" style={{ marginBottom: '0.5rem', color: '#f0c674', fontSize: '0.9rem' }}>
+                Analysis services are slow: feedback and voice analysis are running at a reduced rate.
+              </div>
+            )}
+            {/* Live delivery metrics from the server's local prosody analyzer */}
+            {(() => {
+              if (!prosody) return null;
+              const entries = [
+                ['pitch', prosody.pitch_hz != null ? `${Math.round(prosody.pitch_hz)} Hz` : null],
+                ['pitch range', prosody.pitch_variability_st != null ? `${prosody.pitch_variability_st} st` : null],
+                ['pace', prosody.speaking_rate_sps != null ? `${prosody.speaking_rate_sps} syl/s` : null],
+                ['pauses', prosody.pause_ratio != null ? `${Math.round(prosody.pause_ratio * 100)}%` : null],
+                ['volume', prosody.energy_db != null ? `${prosody.energy_db} dB` : null],
+                ['volume range', prosody.volume_variability_db != null ? `${prosody.volume_variability_db} dB` : null],
+              ].filter(([, v]) => v !== null);
+              if (entries.length === 0) return null;
+              return (
+                <div className="feedback-grid" style={{ display: 'grid', gridTemplateColumns: 'repeat(3, minmax(0, 1fr))', gap: '0.4rem', marginBottom: '0.75rem' }}>
+                  {entries.map(([k, v]) => (
+                    <div key={k} className="feedback-item" style={{ display: 'flex', justifyContent: 'space-between', gap: '0.5rem', background: 'rgba(255,255,255,0.06)', padding: '0.35rem 0.5rem', borderRadius: '6px' }}>
+                      <span className="feedback-key" style={{ color: '#a0a0a0', textTransform: 'capitalize' }}>{k}</span>
+                      <span className="feedback-value" style={{ color: '#ffffff' }}>{v}</span>
+                    </div>
+                  ))}
+                </div>
+              );
+            })()}
             {messages.filter((m) => m && (m.text || m.transcript || (m.llm && m.llm.transcription && m.llm.transcription.text))).length > 0 ? (
               <div className="messages" ref={messagesContainerRef}>
                 {messages
@@ -5,6 +5,14 @@ export function useWebSocket(url) {
 
   const [messages, setMessages] = useState([]);
   const [isConnected, setIsConnected] = useState(false);
+  // In-progress streamed AI feedback ({ id, text }); kept out of `messages` so deltas don't evict transcripts
+  const [feedbackDraft, setFeedbackDraft] = useState(null);
+  // Latest local prosody metrics (several updates per second; only the newest is kept)
+  const [prosody, setProsody] = useState(null);
+  // Server load shedding state ({ degraded, shed }); degraded = reduced analysis while upstreams are slow
+  const [streamStatus, setStreamStatus] = useState(null);
+  // Delta protocol state: running labels/prosody the server sends changes against, and the last frame seq
+  const wire = useRef({ labels: {}, prosody: {}, seq: 0 });
 
   useEffect(() => {
     console.log('Creating WebSocket connection to:', url);
@@ -16,10 +24,77 @@ export function useWebSocket(url) {
       setIsConnected(true);
     };
 
+    //Apply a {key: value|null} delta to running state (null = key removed)
+    const applyDelta = (state, delta) => {
+      Object.entries(delta || {}).forEach(([k, v]) => {
+        if (v === null) delete state[k];
+        else state[k] = v;
+      });
+      return { ...state };
+    };
+
+    //Expand a compact delta frame (see server/wire_protocol.py) into the legacy message shape
+    const expandDelta = (frame) => {
+      const state = wire.current;
+      if (frame.q !== state.seq + 1 && frame.t !== 'hello') {
+        console.warn(`Delta frame gap: expected ${state.seq + 1}, got ${frame.q}`);
+      }
+      state.seq = frame.q;
+      switch (frame.t) {
+        case 'hello':
+          state.labels = {};
+          state.prosody = {};
+          return null;
+        case 'tr':
+          return { segment: frame.s, timestamp: frame.ts, transcript: frame.x, text: frame.x, feedback: { ...state.labels } };
+        case 'bs':
+          return { type: 'bs_update', chunk: { start_ms: frame.a, end_ms: frame.b, seq: frame.w, segment_seq: frame.s }, feedback: applyDelta(state.labels, frame.l) };
+        case 'fd':
+          return { type: 'ai_feedback_delta', feedback_id: frame.i, delta: frame.d };
+        case 'fb':
+          return { type: 'ai_feedback', feedback_id: frame.i, feedback: frame.x, timestamp: frame.ts };
+        case 'fx':
+          return { type: 'ai_feedback_cancelled', feedback_id: frame.i };
+        case 'pr':
+          return { type: 'prosody_update', timestamp: frame.ts, prosody: applyDelta(state.prosody, frame.p) };
+        case 'st':
+          return { type: 'stream_status', degraded: !!frame.dg, shed: frame.sh || {} };
+        case 'end':
+          return { type: 'stream_complete', message: 'Audio stream processing complete' };
+        default:
+          return null;
+      }
+    };
+
     //Message received from server
     ws.current.onmessage = (event) => {
       try {
-        const parsedData = JSON.parse(event.data);
+        let parsedData = JSON.parse(event.data);
+        if (parsedData && parsedData.t !== undefined) {
+          parsedData = expandDelta(parsedData);
+          if (!parsedData) return;
+        }
+        if (parsedData && parsedData.type === 'stream_status') {
+          setStreamStatus({ degraded: !!parsedData.degraded, shed: parsedData.shed || {} });
+          return;
+        }
+        if (parsedData && parsedData.type === 'prosody_update') {
+          setProsody(parsedData.prosody || null);
+          return;
+        }
+        // Streamed feedback: accumulate deltas, drop the draft once final or cancelled
+        if (parsedData && parsedData.type === 'ai_feedback_delta') {
+          setFeedbackDraft((prev) => (
+            prev && prev.id === parsedData.feedback_id
+              ? { id: prev.id, text: prev.text + parsedData.delta }
+              : { id: parsedData.feedback_id, text: parsedData.delta }
+          ));
+          return;
+        }
+        if (parsedData && (parsedData.type === 'ai_feedback' || parsedData.type === 'ai_feedback_cancelled')) {
+          setFeedbackDraft(null);
+          if (parsedData.type === 'ai_feedback_cancelled') return;
+        }
         console.log("Raw Mesage" + parsedData); 
         setMessages((prev) => {
           const newMessages = [...prev, parsedData];
@@ -102,7 +177,10 @@ export function useWebSocket(url) {
   // Clear collected messages (UI reset between sessions)
   const clearMessages = () => {
     setMessages([]);
+    setFeedbackDraft(null);
+    setProsody(null);
+    setStreamStatus(null);
   };
 
-  return { messages, sendMessage, sendBinary, isConnected, clearMessages };
+  return { messages, feedbackDraft, prosody, streamStatus, sendMessage, sendBinary, isConnected, clearMessages };
 }
\ No newline at end of file
@@ -51,8 +51,9 @@ class MicProcessor extends AudioWorkletProcessor {
     if (sign !== 0) linear = -linear;
     if (linear > CLIP) linear = CLIP;
     linear += BIAS;
-    let exponent = 0;
-    for (let expMask = 0x4000; (linear & expMask) === 0 && exponent < 8; exponent++, expMask >>= 1);
+    // Segment = position of the highest set bit above the bias (7 for the loudest samples)
+    let exponent = 7;
+    for (let expMask = 0x4000; (linear & expMask) === 0 && exponent > 0; exponent--, expMask >>= 1);
     const mantissa = (linear >> (exponent + 3)) & 0x0f;
     const mulaw = ~(sign | (exponent << 4) | mantissa);
     return mulaw & 0xff;
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+class AudioRingBuffer:
+    # Fixed-capacity sample ring. Storage is mirrored (every sample is written at
+    # pos and pos + capacity) so any window up to `capacity` samples long is a
+    # contiguous slice and can be handed out as a zero-copy view.
+    def __init__(self, capacity: int, dtype=np.float32):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        # Absolute sample counters; (counter % capacity) is the ring position
+        self._start = 0
+        self._end = 0
+        # Samples discarded because the buffer was full
+        self.dropped_samples = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    # Absolute stream index of the oldest retained sample
+    @property
+    def start_index(self) -> int:
+        return self._start
+
+    # Absolute stream index one past the newest sample
+    @property
+    def end_index(self) -> int:
+        return self._end
+
+    # Memory held by this buffer in bytes (the explicit per-stream bound)
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    #Append samples, discarding the oldest ones if the capacity is exceeded
+    def write(self, samples: np.ndarray):
+        samples = np.asarray(samples).reshape(-1)
+        n = len(samples)
+        if n == 0:
+            return
+        if n > self.capacity:
+            skipped = n - self.capacity
+            samples = samples[skipped:]
+            self._end += skipped
+            n = self.capacity
+
+        cap = self.capacity
+        pos = self._end % cap
+        first = min(n, cap - pos)
+        self._data[pos:pos + first] = samples[:first]
+        self._data[pos + cap:pos + cap + first] = samples[:first]
+        rest = n - first
+        if rest:
+            self._data[:rest] = samples[first:]
+            self._data[cap:cap + rest] = samples[first:]
+        self._end += n
+
+        overflow = len(self) - cap
+        if overflow > 0:
+            self._start += overflow
+            self.dropped_samples += overflow
+
+    #Zero-copy read-only view of `length` samples starting `offset` samples after the oldest one.
+    #The view stays valid until the writer laps it; copy it if it must outlive further writes.
+    def window(self, length: int, offset: int = 0) -> np.ndarray:
+        if offset < 0 or length < 0 or offset + length > len(self):
+            raise ValueError(f"window [{offset}, {offset + length}) out of range for {len(self)} buffered samples")
+        pos = (self._start + offset) % self.capacity
+        view = self._data[pos:pos + length]
+        view.flags.writeable = False
+        return view
+
+    #Drop `count` of the oldest samples (used to advance past a processed window while keeping overlap)
+    def consume(self, count: int):
+        self._start += max(0, min(int(count), len(self)))
+
+    #Drop everything older than absolute stream index `index`
+    def discard_until(self, index: int):
+        self.consume(int(index) - self._start)
+
+    def clear(self):
+        self._start = self._end
@@ -1,36 +1,166 @@
 import numpy as np
 import io
-import wave
+import struct
+from math import gcd
 
-# Mulaw to PCM conversion (audioop library is deprecated)
-def mulaw_to_linear(mulaw_bytes):
+# G.711 mulaw decode table: code -> 16-bit linear PCM (audioop library is deprecated)
+def _build_mulaw_table():
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = codes & 0x80
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(sign, -magnitude, magnitude).astype(np.int16)
 
-    # Convert bytes to numpy array of uint8
+MULAW_TABLE = _build_mulaw_table()
+MULAW_TABLE_F32 = (MULAW_TABLE.astype(np.float32) / 32768.0)
+MULAW_TABLE_F32.flags.writeable = False
+MULAW_TABLE.flags.writeable = False
+
+# Mulaw to PCM conversion (int16). Pass `out` (int16, same length) to decode without allocating.
+def mulaw_to_linear(mulaw_bytes, out=None):
+    mulaw_data = np.frombuffer(mulaw_bytes, dtype=np.uint8)
+    return np.take(MULAW_TABLE, mulaw_data, out=out, mode="clip")
+
+# Mulaw straight to normalized float32 in [-1, 1) in a single table lookup.
+def mulaw_to_float32(mulaw_bytes, out=None):
     mulaw_data = np.frombuffer(mulaw_bytes, dtype=np.uint8)
-    
-    # Mulaw to linear conversion
-    sign = ((mulaw_data & 0x80) != 0).astype(np.int16)
-    exponent = ((mulaw_data >> 4) & 0x07).astype(np.int16)
-    mantissa = (mulaw_data & 0x0F).astype(np.int16)
-    
-    # Reconstruct linear value
-    linear = np.zeros_like(mulaw_data, dtype=np.int16)
-    linear = (mantissa << (exponent + 3)) + 0x84
-    linear = np.where(sign, -linear, linear)
-    
-    return linear
+    return np.take(MULAW_TABLE_F32, mulaw_data, out=out, mode="clip")
+
+
+# Streaming rational-ratio polyphase resampler (any client rate -> target rate).
+# Keeps filter history and phase between calls, so frames can be fed one at a time.
+class PolyphaseResampler:
+    _filter_cache = {}
+
+    def __init__(self, input_rate: int, output_rate: int = 16000, zero_crossings: int = 16, rolloff: float = 0.95):
+        self.input_rate = int(input_rate)
+        self.output_rate = int(output_rate)
+        if self.input_rate <= 0 or self.output_rate <= 0:
+            raise ValueError(f"Invalid resampling rates: {input_rate} -> {output_rate}")
+        g = gcd(self.input_rate, self.output_rate)
+        self.up = self.output_rate // g
+        self.down = self.input_rate // g
+        self.passthrough = self.up == self.down
+
+        if not self.passthrough:
+            self._phases = self._design(self.up, self.down, zero_crossings, rolloff)
+            self.taps = self._phases.shape[1]
+            self._history = np.zeros(self.taps - 1, dtype=np.float32)
+            # Position of the next output sample, in 1/up input-sample units, relative to the history start
+            self._pos = (self.taps - 1) * self.up
+
+    #Kaiser-windowed sinc low-pass, split into `up` phases (reversed, ready for a dot with input windows)
+    @classmethod
+    def _design(cls, up, down, zero_crossings, rolloff):
+        key = (up, down, zero_crossings, rolloff)
+        phases = cls._filter_cache.get(key)
+        if phases is not None:
+            return phases
+
+        cutoff = rolloff * 0.5 / max(up, down)
+        taps = int(np.ceil(2 * zero_crossings / (2 * cutoff) / up))
+        length = taps * up
+        n = np.arange(length) - (length - 1) / 2.0
+        proto = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, 8.0)
+        proto *= up / proto.sum()
+
+        phases = proto.reshape(taps, up).T[:, ::-1].astype(np.float32)
+        phases.flags.writeable = False
+        cls._filter_cache[key] = phases
+        return phases
+
+    #Resample one block of float samples; returns float32 at the output rate
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if self.passthrough:
+            return samples
+
+        x = np.concatenate((self._history, samples))
+        limit = len(x) * self.up
+        count = max(0, -(-(limit - self._pos) // self.down))
+        positions = self._pos + self.down * np.arange(count, dtype=np.int64)
+        starts = positions // self.up - (self.taps - 1)
+        windows = np.lib.stride_tricks.sliding_window_view(x, self.taps)
+        out = np.einsum("ij,ij->i", windows[starts], self._phases[positions % self.up])
+
+        consumed = len(x) - (self.taps - 1)
+        self._pos += count * self.down - consumed * self.up
+        self._history = x[consumed:].copy()
+        return out.astype(np.float32, copy=False)
+
+# Canonical 44-byte header for mono 16-bit PCM WAV; sizes are patched per segment
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+_wav_templates = {}
+
+
+def wav_header(num_samples: int, sample_rate: int = 16000) -> bytes:
+    template = _wav_templates.get(sample_rate)
+    if template is None:
+        template = _WAV_HEADER.pack(b"RIFF", 36, b"WAVE", b"fmt ", 16, 1, 1, sample_rate,
+                                    sample_rate * 2, 2, 16, b"data", 0)
+        _wav_templates[sample_rate] = template
+    header = bytearray(template)
+    data_size = num_samples * 2
+    struct.pack_into("<I", header, 4, 36 + data_size)
+    struct.pack_into("<I", header, 40, data_size)
+    return bytes(header)
+
+
+class AudioSegment:
+    # Encode-once audio: int16 PCM is produced a single time and shared by every
+    # consumer (Whisper, Behavioral Signals, cache keys). WAV bytes are built lazily
+    # on first use and reused; sub-windows are views over the same PCM, not copies.
+    __slots__ = ("pcm", "sample_rate", "_wav")
+
+    def __init__(self, pcm: np.ndarray, sample_rate: int = 16000):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self._wav = None
+
+    #Clip/scale/cast float samples in [-1, 1] to int16 in one preallocated pass
+    @classmethod
+    def from_float(cls, audio: np.ndarray, sample_rate: int = 16000):
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        scaled = np.multiply(audio, 32767.0, dtype=np.float32)
+        np.clip(scaled, -32767.0, 32767.0, out=scaled)
+        pcm = np.empty(len(audio), dtype=np.int16)
+        np.copyto(pcm, scaled, casting="unsafe")
+        return cls(pcm, sample_rate)
+
+    def __len__(self):
+        return len(self.pcm)
+
+    @property
+    def duration_s(self) -> float:
+        return len(self.pcm) / float(self.sample_rate)
+
+    #Zero-copy sub-window [start, end) in samples
+    def window(self, start: int, end: int = None):
+        return AudioSegment(self.pcm[start:end], self.sample_rate)
+
+    #Zero-copy bytes view of the PCM payload
+    def pcm_view(self) -> memoryview:
+        return memoryview(self.pcm).cast("B")
+
+    #Complete WAV file, built once and cached
+    def wav_bytes(self) -> bytes:
+        if self._wav is None:
+            self._wav = b"".join((wav_header(len(self.pcm), self.sample_rate), self.pcm_view()))
+        return self._wav
+
+    #Normalized float32 copy (for consumers that need float samples)
+    def to_float(self) -> np.ndarray:
+        return self.pcm.astype(np.float32) / 32768.0
+
+
+#Accept either an AudioSegment or a float numpy chunk
+def as_segment(audio, sample_rate: int = 16000) -> AudioSegment:
+    if isinstance(audio, AudioSegment):
+        return audio
+    return AudioSegment.from_float(audio, sample_rate)
+
 
 # Converts a numpy array into wav byte format
 def numpy_to_wav_bytes(audio_chunk: np.ndarray, target_sample_rate: int = 16000):
-    audio = np.asarray(audio_chunk, dtype=np.float32)
-    if audio.ndim != 1:
-        audio = audio.reshape(-1)
-    audio = np.clip(audio, -1.0, 1.0)
-    pcm16 = (audio * 32767.0).astype(np.int16)
-    buf = io.BytesIO()
-    with wave.open(buf, 'wb') as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)  # 16-bit PCM
-        wf.setframerate(target_sample_rate)
-        wf.writeframes(pcm16.tobytes())
-    return buf
\ No newline at end of file
+    return io.BytesIO(as_segment(audio_chunk, target_sample_rate).wav_bytes())
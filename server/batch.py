@@ -0,0 +1,419 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_utils import mulaw_to_float32, PolyphaseResampler, AudioSegment
+from vad import SpeechSegmenter
+from prosody import ProsodyAnalyzer
+from whisp_adapter import Transcriber
+from bs_adapter import ToneAnalyzer, close_http_session, iter_final_labels
+from ws_processor import WebSocketProcessor
+import tone_timeline
+import openai_client
+import upstream_scheduler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Offline counterpart of the live stream: recorded sessions go through the same
+# segmentation -> Transcriber / ToneAnalyzer -> feedback steps, many files at a time.
+#   python batch.py recordings/ results/ --processes 8 --jobs 16
+# Decoding, resampling, VAD and prosody run in a process pool; upstream calls share one
+# bounded async budget (on top of the per-provider schedulers). Progress is appended to
+# <output>/manifest.jsonl, so an interrupted run picks up where it stopped.
+
+SAMPLE_RATE = 16000
+WAV_EXTENSIONS = (".wav", ".wave")
+# Headerless G.711 mulaw (rate from --mulaw-rate)
+MULAW_EXTENSIONS = (".ul", ".ulaw", ".mulaw", ".mu")
+# Audio handed to the segmenter / prosody analyzer per step, as the live decode stage would
+BLOCK_S = 0.1
+
+
+#Decode WAV samples (PCM 8/16/24/32-bit, IEEE float, G.711 mulaw) to mono float32 in [-1, 1]
+def _decode_wav_data(payload: bytes, tag: int, channels: int, bits: int) -> np.ndarray:
+    width = 1 if tag == 7 else bits // 8
+    frame = max(1, width * channels)
+    payload = payload[:len(payload) - len(payload) % frame]
+    if tag == 7:
+        samples = mulaw_to_float32(payload)
+    elif tag == 1 and bits == 16:
+        samples = np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32768.0
+    elif tag == 1 and bits == 8:
+        samples = (np.frombuffer(payload, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif tag == 1 and bits == 24:
+        b = np.frombuffer(payload, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        value = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        value = np.where(value & 0x800000, value - (1 << 24), value)
+        samples = value.astype(np.float32) / 8388608.0
+    elif tag == 1 and bits == 32:
+        samples = (np.frombuffer(payload, dtype="<i4") / 2147483648.0).astype(np.float32)
+    elif tag == 3 and bits in (32, 64):
+        samples = np.frombuffer(payload, dtype="<f4" if bits == 32 else "<f8").astype(np.float32)
+    else:
+        raise ValueError(f"Unsupported WAV format (tag={tag}, bits={bits})")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+#Parse a RIFF/WAVE file; returns (mono float32 samples, sample rate)
+def read_wav(data: bytes):
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, pos)
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", data, body)
+            if tag == 0xFFFE and size >= 26:
+                # WAVE_FORMAT_EXTENSIBLE: the real tag leads the subformat GUID
+                tag = struct.unpack_from("<H", data, body + 24)[0]
+            fmt = (tag, channels, rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            tag, channels, rate, bits = fmt
+            # Streamed writers leave the size unset (0xFFFFFFFF); slicing clamps to the file
+            return _decode_wav_data(data[body:body + size], tag, channels, bits), rate
+        pos = body + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+def load_audio(path: str, mulaw_rate: int):
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.lower().endswith(MULAW_EXTENSIONS):
+        return mulaw_to_float32(data), mulaw_rate
+    return read_wav(data)
+
+
+#Live-stream segmentation settings, so batch segments match what a live session would produce
+def segmenter_settings(processor: WebSocketProcessor) -> dict:
+    return {
+        "min_segment_s": processor.min_segment_s,
+        "max_segment_s": processor.max_segment_s,
+        "pause_s": processor.pause_s,
+        "overlap_s": processor.overlap_s,
+    }
+
+
+#Process-pool step: decode, resample to 16kHz, cut utterances and take prosody at each cut.
+#Returns plain data (int16 PCM per segment) so it pickles cheaply back to the event loop.
+def prepare_file(path: str, mulaw_rate: int, settings: dict) -> dict:
+    started = time.perf_counter()
+    samples, rate = load_audio(path, mulaw_rate)
+    audio = PolyphaseResampler(rate, SAMPLE_RATE).process(samples)
+
+    segmenter = SpeechSegmenter(sample_rate=SAMPLE_RATE, **settings)
+    prosody = ProsodyAnalyzer(sample_rate=SAMPLE_RATE)
+    block = int(BLOCK_S * SAMPLE_RATE)
+    found = []
+    for i in range(0, len(audio), block):
+        chunk = audio[i:i + block]
+        prosody.push(chunk)
+        for segment in segmenter.push(chunk):
+            found.append((segment, dict(prosody.latest or {})))
+    for segment in segmenter.flush():
+        found.append((segment, dict(prosody.latest or {})))
+
+    segments = []
+    for segment, snapshot in found:
+        segments.append({
+            "start_ms": segment.start * 1000 // SAMPLE_RATE,
+            "end_ms": segment.end * 1000 // SAMPLE_RATE,
+            "forced": segment.forced,
+            "pcm": AudioSegment.from_float(audio[segment.start:segment.end], SAMPLE_RATE).pcm,
+            "prosody": snapshot,
+        })
+    return {
+        "duration_s": round(len(audio) / SAMPLE_RATE, 2),
+        "segmentation": segmenter.stats(),
+        "segments": segments,
+        "prepare_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def write_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class Manifest:
+    # Append-only progress log (JSON lines, last entry per file wins). On resume a file is
+    # skipped when its last entry is "done" and its size and mtime are unchanged, so
+    # failed or modified recordings are processed again.
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        torn = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Partial line from an interrupted run
+                        continue
+                    self.entries[entry["file"]] = entry
+        self._file = open(path, "a")
+        if torn:
+            self._file.write("\n")
+
+    def is_done(self, name: str, stat: os.stat_result) -> bool:
+        entry = self.entries.get(name)
+        return (entry is not None and entry.get("status") == "done"
+                and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns)
+
+    def record(self, name: str, stat: os.stat_result, status: str, **fields):
+        entry = {
+            "file": name,
+            "status": status,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "ts_ms": int(time.time() * 1000),
+            **fields,
+        }
+        self.entries[name] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+#Audio files under root (recursive), as paths relative to root in a stable order
+def discover(root: str) -> list:
+    found = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.lower().endswith(WAV_EXTENSIONS + MULAW_EXTENSIONS):
+                found.append(os.path.relpath(os.path.join(directory, name), root))
+    return sorted(found)
+
+
+class BatchRunner:
+    def __init__(self, args):
+        self.args = args
+        self.input_dir = args.input_dir
+        self.output_dir = args.output_dir
+        # Segments with Whisper/BS requests in flight, across all files
+        self.upstream = asyncio.Semaphore(args.upstream_concurrency)
+        self.pool = None
+        self.manifest = None
+
+        # Counters
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.audio_s = 0.0
+
+    async def run(self) -> dict:
+        # Without a client every transcript would come back empty and files would be marked done
+        if openai_client.get_client() is None:
+            raise RuntimeError("OpenAI client unavailable (is OPENAI_API_KEY set?); nothing processed")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(self.output_dir, "manifest.jsonl"))
+        pending = []
+        for name in discover(self.input_dir):
+            stat = os.stat(os.path.join(self.input_dir, name))
+            if self.manifest.is_done(name, stat):
+                self.skipped += 1
+            else:
+                pending.append((name, stat))
+        if self.args.limit:
+            pending = pending[:self.args.limit]
+        queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+        logger.info(f"Batch: {queue.qsize()} files to process, {self.skipped} already done")
+
+        # Spawned workers: they must not inherit the running event loop or its threads
+        self.pool = ProcessPoolExecutor(self.args.processes, mp_context=multiprocessing.get_context("spawn"))
+        started = time.monotonic()
+        try:
+            await asyncio.gather(*(self.worker(queue) for _ in range(self.args.jobs)))
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            self.manifest.close()
+        wall_s = time.monotonic() - started
+        summary = {
+            "done": self.done,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "audio_s": round(self.audio_s, 1),
+            "wall_s": round(wall_s, 1),
+            "realtime_factor": round(self.audio_s / wall_s, 1) if wall_s else 0.0,
+        }
+        logger.info(f"Batch complete: {summary}")
+        return summary
+
+    async def worker(self, queue: asyncio.Queue):
+        while True:
+            try:
+                name, stat = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                result = await self.process_file(name)
+            except Exception as e:
+                self.failed += 1
+                self.manifest.record(name, stat, "failed", error=str(e) or type(e).__name__)
+                logger.error(f"Batch {name} failed: {e}")
+                continue
+            self.audio_s += result["duration_s"]
+            output = os.path.relpath(self.output_path(name), self.output_dir)
+            if result["transcription_failures"]:
+                # Results are kept, but the file is retried on the next run
+                self.failed += 1
+                self.manifest.record(name, stat, "failed", output=output,
+                                     error=f"{result['transcription_failures']} transcription requests failed")
+            else:
+                self.done += 1
+                self.manifest.record(name, stat, "done", output=output, segments=len(result["segments"]))
+            logger.info(f"Batch {name}: {len(result['segments'])} segments, {result['duration_s']}s audio "
+                        f"in {result['processing_s']}s")
+
+    def output_path(self, name: str) -> str:
+        return os.path.join(self.output_dir, name + ".json")
+
+    #One recording: segment in the process pool, analyze segments concurrently, feedback in order
+    async def process_file(self, name: str) -> dict:
+        # Fair share of the upstream schedulers per file, like per live stream
+        upstream_scheduler.current_stream.set(name)
+        started = time.monotonic()
+        tone_analyzer = ToneAnalyzer()
+        # Labels are read from each segment's own results; no per-label log lines
+        tone_analyzer.feedback_handler = lambda task, label, meta: None
+        processor = WebSocketProcessor(None, Transcriber(), tone_analyzer)
+        processor.stream_id = f"batch:{name}"
+        processor.user_intent = self.args.user_intent
+        processor.user_purpose = self.args.user_purpose
+        processor.user_audience = self.args.audience_type
+
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(self.pool, prepare_file, os.path.join(self.input_dir, name),
+                                              self.args.mulaw_rate, segmenter_settings(processor))
+
+        analyses = [asyncio.create_task(self.analyze_segment(processor, segment)) for segment in prepared["segments"]]
+        segments = []
+        try:
+            # Feedback builds on the previous segments' context, so it runs in segment order
+            for seq, (segment, analysis) in enumerate(zip(prepared["segments"], analyses), 1):
+                text, labels, windows = await analysis
+                feedback = None
+                if text and not self.args.no_feedback:
+                    feedback = await self.segment_feedback(processor, text, labels, segment["prosody"])
+                segments.append({
+                    "seq": seq,
+                    "start_ms": segment["start_ms"],
+                    "end_ms": segment["end_ms"],
+                    "forced": segment["forced"],
+                    "transcript": text,
+                    "labels": labels,
+                    "tone_windows": windows,
+                    "prosody": segment["prosody"],
+                    "feedback": feedback,
+                })
+        finally:
+            for analysis in analyses:
+                analysis.cancel()
+
+        result = {
+            "file": name,
+            "duration_s": prepared["duration_s"],
+            "segmentation": prepared["segmentation"],
+            "transcript": " ".join(s["transcript"] for s in segments if s["transcript"]),
+            "segments": segments,
+            "summary": processor.llm_context.summary,
+            "transcription_failures": processor.transcriber.failed_requests,
+            "prepare_s": prepared["prepare_s"],
+            "processing_s": round(time.monotonic() - started, 3),
+        }
+        await asyncio.to_thread(write_json, self.output_path(name), result)
+        return result
+
+    #Whisper on the segment and Behavioral Signals on its tone windows (the live stream's
+    #window/hop), within the shared upstream budget. Labels are folded in window order.
+    async def analyze_segment(self, processor: WebSocketProcessor, segment: dict):
+        chunk = AudioSegment(segment["pcm"], SAMPLE_RATE)
+        offsets = tone_timeline.window_offsets(len(chunk), int(processor.tone_window_s * SAMPLE_RATE),
+                                               max(1, int(processor.tone_hop_s * SAMPLE_RATE)))
+        async with self.upstream:
+            # Tone is best-effort, as in the live stream: a failed window comes back as {}
+            text, tones = await asyncio.gather(
+                processor.transcriber.transcribe_chunk(chunk),
+                processor.tone_analyzer.analyze_batch([chunk.window(start, end) for start, end in offsets]),
+                return_exceptions=True,
+            )
+        for result in (text, tones):
+            if isinstance(result, BaseException):
+                raise result
+        labels = {}
+        windows = []
+        for (start, end), tone in zip(offsets, tones):
+            window_labels = {task: label for task, label, _ in iter_final_labels(tone)} if tone else None
+            labels.update(window_labels or {})
+            windows.append({
+                "start_ms": segment["start_ms"] + start * 1000 // SAMPLE_RATE,
+                "end_ms": segment["start_ms"] + end * 1000 // SAMPLE_RATE,
+                "labels": window_labels,
+            })
+        return text.strip(), labels, windows
+
+    #Same prompt and bounded context as live feedback, with this segment's own tone and prosody
+    async def segment_feedback(self, processor: WebSocketProcessor, text: str, labels: dict, prosody: dict):
+        payload = processor.assemble_llm_input(text, labels, prosody)
+        feedback = (await processor.request_gpt_feedback(payload) or "").strip()
+        if feedback:
+            processor.gpt_responses.append(feedback)
+            processor.llm_context.add_feedback(feedback)
+        await processor.llm_context.maybe_summarize()
+        return feedback or None
+
+
+async def main(args) -> dict:
+    try:
+        return await BatchRunner(args).run()
+    finally:
+        await close_http_session()
+        await openai_client.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run recorded sessions (WAV / raw mulaw) through the Resonate pipeline")
+    parser.add_argument("input_dir", help="directory of recordings (searched recursively)")
+    parser.add_argument("output_dir", help="per-file results (<name>.json) and manifest.jsonl")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for decoding / segmentation / prosody")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="files in progress at once (default: 2 x processes)")
+    parser.add_argument("--upstream-concurrency", type=int, default=8,
+                        help="segments with Whisper/Behavioral Signals requests in flight, across all files")
+    parser.add_argument("--mulaw-rate", type=int, default=8000, help="sample rate of headerless mulaw files")
+    parser.add_argument("--no-feedback", action="store_true", help="transcripts and tone only, no GPT feedback")
+    parser.add_argument("--user-intent", default=None, help="tone the speaker was aiming for (as in stream_start)")
+    parser.add_argument("--user-purpose", default=None)
+    parser.add_argument("--audience-type", default=None)
+    parser.add_argument("--limit", type=int, default=0, help="process at most N pending files this run")
+    args = parser.parse_args()
+    if args.jobs is None:
+        args.jobs = 2 * args.processes
+
+    summary = asyncio.run(main(args))
+    sys.exit(1 if summary["failed"] else 0)
@@ -0,0 +1,65 @@
+import os
+import sys
+import timeit
+
+import numpy as np
+
+# Run from anywhere: python server/benchmarks/bench_audio_utils.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audio_utils
+
+
+# Previous decoder (no bit inversion / bias removal), kept as the baseline
+def legacy_mulaw_to_linear(mulaw_bytes):
+    mulaw_data = np.frombuffer(mulaw_bytes, dtype=np.uint8)
+    sign = ((mulaw_data & 0x80) != 0).astype(np.int16)
+    exponent = ((mulaw_data >> 4) & 0x07).astype(np.int16)
+    mantissa = (mulaw_data & 0x0F).astype(np.int16)
+    linear = (mantissa << (exponent + 3)) + 0x84
+    return np.where(sign, -linear, linear)
+
+
+# Previous float path in process_audio_bytes: decode, cast, normalize
+def legacy_decode_float(mulaw_bytes):
+    return legacy_mulaw_to_linear(mulaw_bytes).astype(np.float32) / 32768.0
+
+
+# Previous resampling: none (client rate was ignored), so the baseline is nearest-sample decimation
+def legacy_resample(samples, input_rate, output_rate=16000):
+    idx = (np.arange(int(len(samples) * output_rate / input_rate)) * (input_rate / output_rate)).astype(np.int64)
+    return samples[idx]
+
+
+def bench(label, fn, samples, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    ns = best / number / samples * 1e9
+    print(f"{label:<44} {ns:8.2f} ns/sample  {best / number * 1e6:9.2f} us/call")
+
+
+def main():
+    rng = np.random.default_rng(0)
+
+    print("mulaw decode")
+    for frame_ms in (20, 100):
+        n = 16 * frame_ms
+        frame = rng.integers(0, 256, n, dtype=np.uint8).tobytes()
+        out_i16 = np.empty(n, dtype=np.int16)
+        out_f32 = np.empty(n, dtype=np.float32)
+        number = 20000 if frame_ms == 20 else 5000
+        bench(f"  legacy int16 ({frame_ms} ms frame)", lambda: legacy_mulaw_to_linear(frame), n, number)
+        bench(f"  table int16, out= ({frame_ms} ms frame)", lambda: audio_utils.mulaw_to_linear(frame, out=out_i16), n, number)
+        bench(f"  legacy float32 ({frame_ms} ms frame)", lambda: legacy_decode_float(frame), n, number)
+        bench(f"  table float32, out= ({frame_ms} ms frame)", lambda: audio_utils.mulaw_to_float32(frame, out=out_f32), n, number)
+
+    print("resample to 16 kHz (20 ms frames, streaming)")
+    for rate in (8000, 16000, 44100, 48000):
+        n = rate // 50
+        frame = (0.1 * rng.standard_normal(n)).astype(np.float32)
+        resampler = audio_utils.PolyphaseResampler(rate)
+        bench(f"  legacy decimation {rate} Hz", lambda: legacy_resample(frame, rate), n, 2000)
+        bench(f"  polyphase {rate} Hz", lambda: resampler.process(frame), n, 2000)
+
+
+if __name__ == "__main__":
+    main()
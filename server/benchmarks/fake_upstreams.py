@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from aiohttp import web
+
+# Local stand-ins for the upstream APIs the server calls, so load tests cost nothing
+# and are not subject to network noise:
+#   POST /v1/audio/transcriptions                      OpenAI Whisper
+#   POST /v1/chat/completions                          OpenAI chat (plain and SSE streaming)
+#   POST /v5/clients/{cid}/processes/audio             Behavioral Signals submit
+#   GET  /v5/clients/{cid}/processes/{pid}             Behavioral Signals status
+#   GET  /v5/clients/{cid}/processes/{pid}/results     Behavioral Signals results
+#   GET  /stats                                        request / error / latency counters
+#
+# Point the server at it with OPENAI_BASE_URL=http://host:port/v1 and
+# BEHAVIORAL_SIGNALS_API_BASE_URL=http://host:port/v5.
+
+
+class LatencyModel:
+    # Log-normal service time: `median_ms` is the 50th percentile, `sigma` the spread
+    # (0 = constant). Injected failures answer with `error_status` instead.
+    def __init__(self, median_ms: float, sigma: float = 0.0, error_rate: float = 0.0, error_status: int = 500):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    #"median_ms[:sigma[:error_rate]]", e.g. "300:0.5:0.01"
+    @classmethod
+    def parse(cls, spec: str):
+        parts = [float(p) for p in spec.split(":")]
+        return cls(*parts[:3])
+
+    def sample_s(self) -> float:
+        if self.sigma <= 0:
+            return self.median_ms / 1000.0
+        return random.lognormvariate(0.0, self.sigma) * self.median_ms / 1000.0
+
+    def fails(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class FakeUpstreams:
+    def __init__(self, whisper: LatencyModel, chat: LatencyModel, bs_submit: LatencyModel,
+                 bs_processing: LatencyModel, bs_poll: LatencyModel = None,
+                 stream_tokens: int = 4, feedback: str = "Breathe and slow down."):
+        self.models = {
+            "whisper": whisper,
+            "chat": chat,
+            "bs_submit": bs_submit,
+            # Time from submission until the process reports status 2 (complete)
+            "bs_processing": bs_processing,
+            "bs_poll": bs_poll or LatencyModel(5.0),
+        }
+        self.stream_tokens = stream_tokens
+        self.feedback = feedback
+        self._pids = itertools.count(1)
+        # pid -> monotonic time the process completes (None = failed)
+        self._processes = {}
+        self.requests = {}
+        self.errors = {}
+
+    def _count(self, name: str, failed: bool):
+        self.requests[name] = self.requests.get(name, 0) + 1
+        if failed:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    #Sleep for the service time, then either fail or return None
+    async def _serve(self, name: str, model: LatencyModel = None):
+        model = model or self.models[name]
+        await asyncio.sleep(model.sample_s())
+        failed = model.fails()
+        self._count(name, failed)
+        if failed:
+            return web.json_response({"error": {"message": f"injected {name} failure"}}, status=model.error_status)
+        return None
+
+    async def transcriptions(self, request):
+        form = await request.post()
+        upload = form.get("file")
+        audio_bytes = len(upload.file.read()) if upload is not None else 0
+        error = await self._serve("whisper")
+        if error is not None:
+            return error
+        # ~2.5 words per second of 16 kHz int16 audio
+        words = max(1, int((audio_bytes - 44) / 32000 * 2.5))
+        return web.json_response({"text": " ".join(["word"] * words)})
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        if not body.get("stream"):
+            error = await self._serve("chat")
+            if error is not None:
+                return error
+            return web.json_response({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self.feedback}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        # Streaming: time to first token follows the chat model, the rest is spread over stream_tokens
+        model = self.models["chat"]
+        await asyncio.sleep(model.sample_s() / 2)
+        failed = model.fails()
+        self._count("chat", failed)
+        if failed:
+            return web.json_response({"error": {"message": "injected chat failure"}}, status=model.error_status)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = self.feedback.split(" ")
+        per_token_s = model.median_ms / 2000.0 / max(1, self.stream_tokens)
+        for i, word in enumerate(words):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+                     "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                                  "finish_reason": None}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(per_token_s)
+        usage = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+                 "choices": [], "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)}}
+        await response.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode())
+        return response
+
+    async def bs_submit(self, request):
+        await request.read()
+        error = await self._serve("bs_submit")
+        if error is not None:
+            return error
+        pid = next(self._pids)
+        processing = self.models["bs_processing"]
+        self._processes[pid] = None if processing.fails() else time.monotonic() + processing.sample_s()
+        return web.json_response({"pid": pid})
+
+    async def bs_status(self, request):
+        error = await self._serve("bs_poll")
+        if error is not None:
+            return error
+        pid = int(request.match_info["pid"])
+        if pid not in self._processes:
+            return web.json_response({"error": "unknown process"}, status=404)
+        done_at = self._processes[pid]
+        if done_at is None:
+            return web.json_response({"pid": pid, "status": -1})
+        return web.json_response({"pid": pid, "status": 2 if time.monotonic() >= done_at else 1})
+
+    async def bs_results(self, request):
+        error = await self._serve("bs_poll")
+        if error is not None:
+            return error
+        pid = int(request.match_info["pid"])
+        self._processes.pop(pid, None)
+        labels = {"emotion": random.choice(["neutral", "happy", "sad"]),
+                  "strength": random.choice(["weak", "neutral", "strong"]),
+                  "engagement": random.choice(["engaged", "neutral"])}
+        return web.json_response({"pid": pid, "results": [
+            {"id": i, "task": task, "finalLabel": label, "startTime": 0.0, "endTime": 1.0, "level": "utterance"}
+            for i, (task, label) in enumerate(labels.items())
+        ]})
+
+    async def stats(self, request):
+        return web.json_response(self.stats_dict())
+
+    def stats_dict(self) -> dict:
+        return {"requests": dict(self.requests), "errors": dict(self.errors),
+                "open_processes": len(self._processes)}
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.add_routes([
+            web.post("/v1/audio/transcriptions", self.transcriptions),
+            web.post("/v1/chat/completions", self.chat_completions),
+            web.post("/v5/clients/{cid}/processes/audio", self.bs_submit),
+            web.get("/v5/clients/{cid}/processes/{pid}", self.bs_status),
+            web.get("/v5/clients/{cid}/processes/{pid}/results", self.bs_results),
+            web.get("/stats", self.stats),
+        ])
+        return app
+
+    #Serve on host:port until the returned runner is cleaned up
+    async def start(self, host: str = "127.0.0.1", port: int = 8900) -> web.AppRunner:
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+
+def add_latency_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--whisper", default="400:0.4:0", help="Whisper latency median_ms:sigma:error_rate")
+    parser.add_argument("--chat", default="300:0.4:0", help="chat latency median_ms:sigma:error_rate")
+    parser.add_argument("--bs-submit", default="80:0.3:0", help="BS submit latency median_ms:sigma:error_rate")
+    parser.add_argument("--bs-processing", default="1500:0.3:0", help="BS processing time median_ms:sigma:failure_rate")
+
+
+def from_args(args) -> FakeUpstreams:
+    return FakeUpstreams(
+        whisper=LatencyModel.parse(args.whisper),
+        chat=LatencyModel.parse(args.chat),
+        bs_submit=LatencyModel.parse(args.bs_submit),
+        bs_processing=LatencyModel.parse(args.bs_processing),
+    )
+
+
+async def _serve_forever(args):
+    runner = await from_args(args).start(args.host, args.port)
+    print(f"Fake upstreams on http://{args.host}:{args.port} (OpenAI: /v1, Behavioral Signals: /v5)")
+    try:
+        await asyncio.Future()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Whisper / GPT / Behavioral Signals services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_latency_args(parser)
+    asyncio.run(_serve_forever(parser.parse_args()))
@@ -0,0 +1,434 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+
+import aiohttp
+import numpy as np
+import websockets
+
+# Run from anywhere: python server/benchmarks/loadtest.py --sessions 20 --duration 30
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_upstreams
+
+SAMPLE_RATE = 16000
+CHUNK_MS = 20
+CHUNK_SAMPLES = SAMPLE_RATE * CHUNK_MS // 1000
+
+
+#Vectorized port of MicProcessor.linearToMulaw (client/src/worklets/micProcessor.js)
+def linear_to_mulaw(pcm: np.ndarray) -> np.ndarray:
+    linear = pcm.astype(np.int32)
+    sign = (linear >> 8) & 0x80
+    linear = np.where(sign != 0, -linear, linear)
+    linear = np.minimum(linear, 32635) + 0x84
+    exponent = np.clip(np.floor(np.log2(np.maximum(linear, 1))).astype(np.int32) - 7, 0, 7)
+    mantissa = (linear >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+
+#Speech-like test signal: quiet lead-in, then voiced bursts separated by pauses.
+#Returns (mulaw bytes, utterance end times in seconds)
+def synth_speech(duration_s: float, rng: np.random.Generator):
+    parts = [rng.normal(0.0, 2e-4, int(0.6 * SAMPLE_RATE))]
+    ends = []
+    position = len(parts[0]) / SAMPLE_RATE
+    while position < duration_s:
+        length = rng.uniform(1.5, 3.5)
+        t = np.arange(int(length * SAMPLE_RATE)) / SAMPLE_RATE
+        f0 = rng.uniform(110, 220)
+        voiced = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 6))
+        # ~4 syllables per second
+        envelope = 0.5 * (1 - np.cos(2 * np.pi * rng.uniform(3.5, 4.5) * t)) * 0.8 + 0.2
+        parts.append(0.15 * voiced * envelope + rng.normal(0.0, 2e-4, len(t)))
+        position += length
+        ends.append(position)
+        pause = rng.uniform(0.8, 1.2)
+        parts.append(rng.normal(0.0, 2e-4, int(pause * SAMPLE_RATE)))
+        position += pause
+    audio = np.clip(np.concatenate(parts), -1.0, 1.0)
+    pcm = np.where(audio < 0, np.round(audio * 32768), np.round(audio * 32767)).astype(np.int16)
+    return linear_to_mulaw(pcm).tobytes(), ends
+
+
+class SessionStats:
+    def __init__(self, index: int, utterance_ends: list):
+        self.index = index
+        self.utterance_ends = utterance_ends
+        self.frames_sent = 0
+        self.audio_s = 0.0
+        self.max_send_lag_ms = 0.0
+        self.completed = False
+        self.error = None
+        # Stage -> latencies (ms) from the end of the utterance to the server's frame
+        self.latencies = {"transcript": [], "tone": [], "feedback_first_token": [], "feedback": []}
+        self.messages = 0
+
+
+#One simulated client: streams 20ms mulaw frames in real time (scaled by `speed`) and
+#measures, per utterance, when its transcript, tone update and GPT feedback arrive
+async def run_session(url: str, index: int, mulaw: bytes, ends: list, speed: float, feedback_stream: bool,
+                      complete_timeout_s: float) -> SessionStats:
+    stats = SessionStats(index, ends)
+    # FIFO matching for per-segment results; feedback is latest-wins so it maps to the last ended utterance
+    pending = {"transcript": deque(ends), "tone": deque(ends)}
+    first_token_seen = set()
+    complete = asyncio.Event()
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            await ws.send(json.dumps({
+                "type": "stream_start",
+                "stream_id": f"bench-{index}",
+                "encoding": "mulaw",
+                "sample_rate": SAMPLE_RATE,
+                "channels": 1,
+                "timestamp": int(time.time() * 1000),
+                "user_intent": "confident",
+                "user_purpose": "load test",
+                "audience_type": "colleagues",
+                "feedback_stream": feedback_stream,
+            }))
+            t0 = time.monotonic()
+
+            def stream_position() -> float:
+                return (time.monotonic() - t0) * speed
+
+            def latency_ms(end_s: float) -> float:
+                return (time.monotonic() - (t0 + end_s / speed)) * 1000.0
+
+            def latest_end():
+                position = stream_position()
+                ended = [e for e in ends if e <= position]
+                return ended[-1] if ended else None
+
+            async def receive():
+                async for message in ws:
+                    if not isinstance(message, str):
+                        continue
+                    stats.messages += 1
+                    payload = json.loads(message)
+                    kind = payload.get("type")
+                    if kind is None and "transcript" in payload:
+                        kind = "transcript"
+                    elif kind == "bs_update":
+                        kind = "tone"
+                    if kind in pending:
+                        queue = pending[kind]
+                        if queue and queue[0] <= stream_position():
+                            stats.latencies[kind].append(latency_ms(queue.popleft()))
+                    elif kind == "ai_feedback_delta" and payload.get("feedback_id") not in first_token_seen:
+                        first_token_seen.add(payload.get("feedback_id"))
+                        end = latest_end()
+                        if end is not None:
+                            stats.latencies["feedback_first_token"].append(latency_ms(end))
+                    elif kind == "ai_feedback":
+                        end = latest_end()
+                        if end is not None and payload.get("feedback"):
+                            stats.latencies["feedback"].append(latency_ms(end))
+                    elif kind == "stream_complete":
+                        complete.set()
+                        return
+
+            receiver = asyncio.create_task(receive())
+            frame_bytes = CHUNK_SAMPLES
+            for i in range(0, len(mulaw), frame_bytes):
+                due = t0 + (i / SAMPLE_RATE) / speed
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    stats.max_send_lag_ms = max(stats.max_send_lag_ms, -delay * 1000.0)
+                await ws.send(mulaw[i:i + frame_bytes])
+                stats.frames_sent += 1
+            stats.audio_s = len(mulaw) / SAMPLE_RATE
+
+            await ws.send(json.dumps({"type": "stream_end", "timestamp": int(time.time() * 1000)}))
+            try:
+                await asyncio.wait_for(complete.wait(), timeout=complete_timeout_s)
+                stats.completed = True
+            except asyncio.TimeoutError:
+                stats.error = "stream_complete timeout"
+            receiver.cancel()
+    except Exception as e:
+        stats.error = f"{type(e).__name__}: {e}"
+    return stats
+
+
+#Resident set size of a process in bytes (Linux /proc; None elsewhere)
+def rss_bytes(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+#Total RSS of a process and its children (supervisor + workers)
+def tree_rss_bytes(pid: int):
+    total = rss_bytes(pid)
+    if total is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(c) for c in f.read().split()]
+    except OSError:
+        children = []
+    for child in children:
+        total += tree_rss_bytes(child) or 0
+    return total
+
+
+async def sample_memory(pid: int, samples: list, interval_s: float = 0.5):
+    while True:
+        rss = tree_rss_bytes(pid)
+        if rss is not None:
+            samples.append(rss)
+        await asyncio.sleep(interval_s)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout_s: float = 20.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+#Start ws_server.py against the fake upstreams; caching is off so every segment reaches them.
+#With caching on, metrics are served from metrics_port (+ slot per worker) for the cache report
+def spawn_server(port: int, upstream_port: int, workers: int, log_path: str, state_dir: str, cache: bool,
+                 metrics_port: int = None):
+    upstream = f"http://127.0.0.1:{upstream_port}"
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{upstream}/v1",
+        "BEHAVIORAL_SIGNALS_API_BASE_URL": f"{upstream}/v5",
+        "BEHAVIORAL_SIGNALS_API_CID": "bench",
+        "BEHAVIORAL_SIGNALS_API_KEY": "bench",
+        "RESULT_CACHE_ENABLED": "1" if cache else "0",
+        "SESSION_LOG_DIR": os.path.join(state_dir, "session_logs"),
+    })
+    if metrics_port is not None:
+        env.update({"METRICS_ENABLED": "1", "METRICS_PORT": str(metrics_port)})
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "ws_server.py", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values)
+    return {
+        "count": int(arr.size),
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p90": round(float(np.percentile(arr, 90)), 1),
+        "p99": round(float(np.percentile(arr, 99)), 1),
+        "max": round(float(arr.max()), 1),
+    }
+
+
+#Result cache hits/misses summed over the server's workers, from their /metrics pages
+async def scrape_cache_stats(metrics_port: int, workers: int) -> dict:
+    caches = {}
+    ports = [metrics_port + slot for slot in range(workers)] if workers > 1 else [metrics_port]
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+        for port in ports:
+            try:
+                async with session.get(f"http://127.0.0.1:{port}/metrics") as resp:
+                    text = await resp.text()
+            except aiohttp.ClientError as e:
+                print(f"Metrics scrape of port {port} failed: {e}")
+                continue
+            for line in text.splitlines():
+                for counter in ("hits", "misses"):
+                    prefix = f'resonate_cache_{counter}_total{{cache="'
+                    if line.startswith(prefix):
+                        name, value = line[len(prefix):].split('"} ')
+                        stats = caches.setdefault(name, {"hits": 0, "misses": 0})
+                        stats[counter] += int(float(value))
+    for stats in caches.values():
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return caches
+
+
+def build_report(results: list, wall_s: float, memory: dict, upstream_stats: dict, cache_stats: dict = None) -> dict:
+    stages = {}
+    for stage in ("transcript", "tone", "feedback_first_token", "feedback"):
+        stages[stage] = percentiles([v for r in results for v in r.latencies[stage]])
+    utterances = sum(len(r.utterance_ends) for r in results)
+    audio_s = sum(r.audio_s for r in results)
+    return {
+        "sessions": len(results),
+        "completed": sum(r.completed for r in results),
+        "errors": [f"session {r.index}: {r.error}" for r in results if r.error],
+        "wall_s": round(wall_s, 2),
+        "throughput": {
+            "audio_s_per_s": round(audio_s / wall_s, 2) if wall_s else 0.0,
+            "frames_per_s": round(sum(r.frames_sent for r in results) / wall_s, 1) if wall_s else 0.0,
+            "transcripts_per_s": round(stages["transcript"]["count"] / wall_s, 2) if wall_s else 0.0,
+            "utterances": utterances,
+            "transcript_coverage": round(stages["transcript"]["count"] / utterances, 3) if utterances else 0.0,
+            "max_send_lag_ms": round(max((r.max_send_lag_ms for r in results), default=0.0), 1),
+        },
+        # ms from the end of an utterance until the client receives each result
+        "latency_ms": stages,
+        "memory": memory,
+        "upstream": upstream_stats,
+        # None when the server's caches were disabled (or not scraped)
+        "cache": cache_stats,
+    }
+
+
+def print_report(report: dict):
+    print(f"\nSessions: {report['sessions']} ({report['completed']} completed) in {report['wall_s']}s")
+    for key, value in report["throughput"].items():
+        print(f"  {key:22s} {value}")
+    print("\nLatency from end of utterance (ms)")
+    print(f"  {'stage':22s} {'count':>6s} {'p50':>8s} {'p90':>8s} {'p99':>8s} {'max':>8s}")
+    for stage, p in report["latency_ms"].items():
+        if p["count"]:
+            print(f"  {stage:22s} {p['count']:6d} {p['p50']:8.1f} {p['p90']:8.1f} {p['p99']:8.1f} {p['max']:8.1f}")
+        else:
+            print(f"  {stage:22s} {0:6d}")
+    memory = report["memory"]
+    if memory.get("per_stream_bytes") is not None:
+        print(f"\nServer RSS: baseline {memory['baseline_bytes'] / 2**20:.1f} MiB, "
+              f"peak {memory['peak_bytes'] / 2**20:.1f} MiB, "
+              f"per stream {memory['per_stream_bytes'] / 2**10:.0f} KiB")
+    if report["upstream"]:
+        print(f"\nUpstream requests: {report['upstream'].get('requests')} errors: {report['upstream'].get('errors')}")
+    if report["cache"] is None:
+        print("Result caches: disabled (--cache to enable)")
+    else:
+        for name, stats in sorted(report["cache"].items()):
+            print(f"Result cache {name}: hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)")
+    for error in report["errors"][:10]:
+        print(f"  ! {error}")
+
+
+async def run(args) -> dict:
+    rng = np.random.default_rng(args.seed)
+    # Distinct audio per session (content-addressed caches would otherwise collapse them)
+    audio = [synth_speech(args.duration, rng) for _ in range(args.sessions)]
+
+    upstream_runner = None
+    upstreams = None
+    server = None
+    state_dir = tempfile.mkdtemp(prefix="resonate-loadtest-")
+    url = args.url
+    memory_samples = []
+    memory = {}
+    metrics_port = None
+    cache_stats = None
+    try:
+        if url is None:
+            upstreams = fake_upstreams.from_args(args)
+            upstream_port = free_port()
+            upstream_runner = await upstreams.start("127.0.0.1", upstream_port)
+            port = free_port()
+            log_path = os.path.join(state_dir, "server.log")
+            if args.cache:
+                metrics_port = free_port()
+            server = spawn_server(port, upstream_port, args.workers, log_path, state_dir, args.cache, metrics_port)
+            await wait_for_port(port)
+            # Let workers finish importing before taking the baseline
+            await asyncio.sleep(1.0)
+            url = f"ws://127.0.0.1:{port}"
+            print(f"Server pid={server.pid} log={log_path}")
+
+        baseline = tree_rss_bytes(server.pid) if server else None
+        sampler = asyncio.create_task(sample_memory(server.pid, memory_samples)) if server else None
+
+        started = time.monotonic()
+        sessions = []
+        for i, (mulaw, ends) in enumerate(audio):
+            sessions.append(asyncio.create_task(run_session(
+                url, i, mulaw, ends, args.speed, args.feedback_stream, args.complete_timeout)))
+            # Stagger connects so frame boundaries do not line up across sessions
+            await asyncio.sleep(args.ramp / max(1, args.sessions))
+        results = await asyncio.gather(*sessions)
+        wall_s = time.monotonic() - started
+
+        if sampler is not None:
+            sampler.cancel()
+        if baseline is not None and memory_samples:
+            peak = max(memory_samples)
+            memory = {
+                "baseline_bytes": baseline,
+                "peak_bytes": peak,
+                "per_stream_bytes": max(0, peak - baseline) // max(1, args.sessions),
+            }
+        if metrics_port is not None:
+            cache_stats = await scrape_cache_stats(metrics_port, args.workers)
+        report = build_report(results, wall_s, memory, upstreams.stats_dict() if upstreams else {}, cache_stats)
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=40)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if upstream_runner is not None:
+            await upstream_runner.cleanup()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for the Resonate WebSocket server")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent streaming sessions")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of audio per session")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed (1.0 = real time)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions connect")
+    parser.add_argument("--workers", type=int, default=1, help="server worker processes")
+    parser.add_argument("--url", default=None, help="test an already running server instead of spawning one against fakes")
+    parser.add_argument("--feedback-stream", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--cache", action="store_true", help="leave the server's result caches enabled")
+    parser.add_argument("--complete-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    parser.add_argument("--fail-p90-ms", type=float, default=None,
+                        help="exit 1 if the transcript or feedback p90 latency exceeds this (regression gate)")
+    fake_upstreams.add_latency_args(parser)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failed = bool(report["errors"])
+    if args.fail_p90_ms is not None:
+        for stage in ("transcript", "feedback"):
+            p = report["latency_ms"][stage]
+            if p["count"] and p["p90"] > args.fail_p90_ms:
+                print(f"FAIL: {stage} p90 {p['p90']}ms > {args.fail_p90_ms}ms")
+                failed = True
+    sys.exit(1 if failed else 0)
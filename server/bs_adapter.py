@@ -1,15 +1,91 @@
 import asyncio
-import numpy as np
 import logging
 import os
+import time
 import aiohttp
 
 import audio_utils
+import metrics
+import result_cache
+import upstream_scheduler
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# One keep-alive connection pool shared by every stream's ToneAnalyzer
+_http_session = None
+_max_connections_per_host = int(os.getenv("BEHAVIORAL_SIGNALS_MAX_CONNECTIONS", "16"))
+
+
+async def get_http_session() -> aiohttp.ClientSession:
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit_per_host=_max_connections_per_host,
+            keepalive_timeout=30,
+            ttl_dns_cache=300,
+        )
+        _http_session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+    return _http_session
+
+
+async def close_http_session():
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
+class AdaptivePolling:
+    # Poll pacing learned from how long BS actually takes to finish a process.
+    # The first status check lands just before the expected completion time,
+    # then checks back off geometrically.
+    def __init__(self, initial_estimate_s: float = 2.0, min_delay_s: float = 0.25, max_delay_s: float = 2.0,
+                 backoff: float = 1.5, smoothing: float = 0.2):
+        self.estimate_s = initial_estimate_s
+        self.min_delay_s = min_delay_s
+        self.max_delay_s = max_delay_s
+        self.backoff = backoff
+        self.smoothing = smoothing
+
+    def first_delay(self) -> float:
+        return min(self.max_delay_s * 2, max(self.min_delay_s, 0.8 * self.estimate_s))
+
+    def next_delay(self, delay: float) -> float:
+        return min(self.max_delay_s, max(self.min_delay_s, delay * self.backoff))
+
+    #Record an observed post-to-completion time (seconds)
+    def observe(self, elapsed_s: float):
+        self.estimate_s += self.smoothing * (elapsed_s - self.estimate_s)
+
+
+#(task, finalLabel, meta) for each non-ASR task result in a BS results payload
+def iter_final_labels(results_data: dict):
+    for item in results_data.get("results") or []:
+        if not isinstance(item, dict):
+            continue
+        task = item.get("task")
+        if not task or str(task).lower() == "asr":
+            continue
+        final_label = item.get("finalLabel")
+        if final_label is None:
+            continue
+        meta = {
+            "startTime": item.get("startTime"),
+            "endTime": item.get("endTime"),
+            "level": item.get("level"),
+            "id": item.get("id"),
+        }
+        yield str(task), str(final_label), meta
+
+
+# Shared across streams: processing time is a property of the provider, not the stream
+_polling = AdaptivePolling()
+
+# Process-wide tone analysis cache keyed by audio content + endpoint (None when disabled)
+tone_cache = result_cache.from_env("behavioral_signals")
+
 
 class ToneAnalyzer:
     def __init__(self):
@@ -20,6 +96,10 @@ class ToneAnalyzer:
         self.endpoint = f"{self.base_url}/clients/{self.client_id}/processes/audio"
         self.status_base = f"{self.base_url}/clients/{self.client_id}/processes"
         self.target_sample_rate = 16000
+        # Give up on a process that has not finished this long after submission
+        self.poll_timeout_s = 10.0
+        # Process-wide admission control shared with every other stream
+        self._scheduler = upstream_scheduler.get("behavioral_signals")
         
         # Store last request/response details 
         self.last_status_code = None
@@ -56,59 +136,131 @@ class ToneAnalyzer:
 
     #Process/Parse results from BS Poll. Extract finalLabel from each task result and emit feedback.
     def process_results(self, results_data: dict):
-        results = results_data.get("results")
-        for item in results:
-            if not isinstance(item, dict):
-                continue
-            task = item.get("task")
-            if not task or str(task).lower() == "asr":
-                continue
-            final_label = item.get("finalLabel")
-            if final_label is None:
-                continue
-            meta = {
-                "startTime": item.get("startTime"),
-                "endTime": item.get("endTime"),
-                "level": item.get("level"),
-                "id": item.get("id"),
-            }
-            self.send_metric(str(task), str(final_label), meta)
+        for task, final_label, meta in iter_final_labels(results_data):
+            self.send_metric(task, final_label, meta)
     
-    #Post/Poll BS for tone analysis
-    async def analyze_chunk(self, audio_chunk: np.ndarray) -> dict:
+    #Post/Poll BS for tone analysis. Polling stops early once `deadline` (time.monotonic()) has passed.
+    #audio_chunk: AudioSegment (preferred, encoded once) or float numpy array
+    async def analyze_chunk(self, audio_chunk, deadline: float = None) -> dict:
+
+        segment = audio_utils.as_segment(audio_chunk, self.target_sample_rate)
+        cache_key = None
+        if tone_cache is not None:
+            cache_key = tone_cache.key(segment, endpoint=self.endpoint, rate=segment.sample_rate)
+            cached = await tone_cache.lookup(cache_key)
+            if cached is not None:
+                self.process_results(cached)
+                return cached
+
+        try:
+            return await self._submit_and_poll(segment, cache_key, deadline)
+        except upstream_scheduler.UpstreamBusy:
+            logger.info("BS analysis not admitted before its deadline, skipped")
+            return {}
+
+    #Report an HTTP status to the shared scheduler (429 pauses every stream's BS requests)
+    def _note_status(self, resp):
+        if resp.status == 429:
+            retry_after = resp.headers.get("Retry-After")
+            self._scheduler.report_rate_limited(float(retry_after) if retry_after and retry_after.isdigit() else None)
+        elif resp.status < 400:
+            self._scheduler.report_success()
+
+    #JSON body of a successful response; None for an error status (whose body may be HTML) or a body that isn't JSON
+    async def _read_json(self, resp, step: str):
+        if resp.status >= 400:
+            return None
+        try:
+            return await resp.json(content_type=None)
+        except ValueError as e:
+            logger.warning(f"BS {step} returned an unreadable body (status={resp.status}): {e}")
+            return None
 
-        wav_bytes = audio_utils.numpy_to_wav_bytes(audio_chunk).getvalue()
+    async def _submit_and_poll(self, segment, cache_key, deadline: float = None) -> dict:
+        # Same cached WAV bytes the Whisper upload uses
+        wav_bytes = segment.wav_bytes()
         headers = {
             "X-Auth-Token": self.api_key,
             "Accept": "application/json",
         }
-
-        process_id = None
-        last_data = None
+        session = await get_http_session()
+        started = time.monotonic()
 
         # Create process/Post Request
-        async with aiohttp.ClientSession() as session:
-            form = aiohttp.FormData()
-            form.add_field("file", wav_bytes, filename="audio.wav", content_type="audio/wav")
-            async with session.post(self.endpoint, headers=headers, data=form, timeout=aiohttp.ClientTimeout(total=30)) as resp:
-                data = await resp.json()
-                process_id = data.get("pid")
-
-            # Poll process status for every 0.5 seconds for up to 10 seconds
-            status_url = f"{self.status_base}/{process_id}"
-            for attempt in range(20):
-                await asyncio.sleep(0.5)
-                async with session.get(status_url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as poll_resp:
-                    if poll_resp.status >= 400:
-                        continue
-                    last_data = await poll_resp.json()
-                    status = last_data.get("status")
-                    if status == 2:
-                        results_url = f"{self.status_base}/{process_id}/results"
-                        # Poll process results 
-                        async with session.get(results_url, headers=headers, timeout=aiohttp.ClientTimeout(total=30)) as results_resp:
-                            if results_resp.status >= 400:
-                                break
-                            results_data = await results_resp.json()
-                            self.process_results(results_data)
-                        break
\ No newline at end of file
+        form = aiohttp.FormData()
+        form.add_field("file", wav_bytes, filename="audio.wav", content_type="audio/wav")
+        # Every request for this window (submit, polls, results) carries its freshness as priority
+        async with self._scheduler.slot(started, deadline):
+            with metrics.timer("bs_post"):
+                async with session.post(self.endpoint, headers=headers, data=form) as resp:
+                    self.last_status_code = resp.status
+                    self._note_status(resp)
+                    data = await self._read_json(resp, "bs_post")
+        metrics.upstream("bs_post", data is not None)
+        self.last_raw_response = data
+        process_id = data.get("pid") if isinstance(data, dict) else None
+        if process_id is None:
+            logger.warning(f"BS process creation failed: status={resp.status}")
+            return {}
+
+        # Poll process status, pacing by the observed processing time
+        status_url = f"{self.status_base}/{process_id}"
+        delay = _polling.first_delay()
+        while time.monotonic() - started < self.poll_timeout_s:
+            if deadline is not None and time.monotonic() + delay > deadline:
+                logger.info(f"BS process {process_id} is stale, polling abandoned")
+                return {}
+            await asyncio.sleep(delay)
+            delay = _polling.next_delay(delay)
+            async with self._scheduler.slot(started, deadline):
+                with metrics.timer("bs_poll"):
+                    async with session.get(status_url, headers=headers) as poll_resp:
+                        self.last_status_code = poll_resp.status
+                        self._note_status(poll_resp)
+                        last_data = await self._read_json(poll_resp, "bs_poll")
+            metrics.upstream("bs_poll", last_data is not None)
+            if not isinstance(last_data, dict):
+                continue
+            status = last_data.get("status")
+            if isinstance(status, int) and status < 0:
+                logger.warning(f"BS process {process_id} failed: {last_data}")
+                self.last_raw_response = last_data
+                return {}
+            if status != 2:
+                continue
+
+            _polling.observe(time.monotonic() - started)
+            metrics.observe("bs_processing", time.monotonic() - started)
+            results_url = f"{self.status_base}/{process_id}/results"
+            # Fetch process results
+            async with self._scheduler.slot(started, deadline):
+                with metrics.timer("bs_results"):
+                    async with session.get(results_url, headers=headers) as results_resp:
+                        self.last_status_code = results_resp.status
+                        self._note_status(results_resp)
+                        results_data = await self._read_json(results_resp, "bs_results")
+            metrics.upstream("bs_results", results_data is not None)
+            if not isinstance(results_data, dict):
+                return {}
+            self.last_raw_response = results_data
+            self.last_duration_ms = int((time.monotonic() - started) * 1000)
+            self.process_results(results_data)
+            if cache_key is not None:
+                await tone_cache.store(cache_key, results_data)
+            return results_data
+
+        _polling.observe(self.poll_timeout_s)
+        logger.warning(f"BS process {process_id} not finished after {self.poll_timeout_s}s")
+        return {}
+
+    #Submit several windows at once: all share the keep-alive pool, the adaptive poll pacing and
+    #the deadline. Results come back in input order, {} for a window that failed
+    async def analyze_batch(self, audio_chunks: list, deadline: float = None) -> list:
+        results = await asyncio.gather(
+            *(self.analyze_chunk(chunk, deadline) for chunk in audio_chunks),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"BS batch item failed: {result}")
+        return [r if isinstance(r, dict) else {} for r in results]
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from collections import deque
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+#Rough token count (~4 characters per token for English); good enough for budgeting
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4 if text else 0
+
+
+class ConversationContext:
+    # Bounded conversation memory for the GPT prompt: a rolling window of recent
+    # segments verbatim, plus a compact summary that older segments are folded into.
+    # Prompt size therefore stays flat instead of growing with session length.
+    def __init__(self, token_budget: int = 800, recent_segments: int = 4, feedback_history: int = 3,
+                 summary_tokens: int = 200, summarize_after_tokens: int = 300, summarizer=None):
+        self.token_budget = token_budget
+        self.recent_segments = recent_segments
+        self.summary_tokens = summary_tokens
+        self.summarize_after_tokens = summarize_after_tokens
+        # async (summary: str, evicted_text: str) -> str; None = local truncation only
+        self.summarizer = summarizer
+
+        self.summary = ""
+        self._recent = deque()
+        self._feedback = deque(maxlen=feedback_history)
+        # Text evicted from the window but not yet folded into the summary
+        self._pending = []
+        self._summarizing = False
+
+    def add_segment(self, text: str, voice_analysis: dict = None):
+        text = (text or "").strip()
+        if not text:
+            return
+        self._recent.append({"text": text, "voice_analysis": dict(voice_analysis or {})})
+        while len(self._recent) > self.recent_segments:
+            self._evict_oldest()
+
+    def add_feedback(self, feedback: str):
+        feedback = (feedback or "").strip()
+        if feedback:
+            self._feedback.append(feedback)
+
+    def _evict_oldest(self):
+        segment = self._recent.popleft()
+        self._pending.append(segment["text"])
+
+    #Serializable snapshot (for externalized per-stream state)
+    def to_dict(self) -> dict:
+        return {
+            "summary": self.summary,
+            "recent": list(self._recent),
+            "feedback": list(self._feedback),
+            "pending": list(self._pending),
+        }
+
+    def restore(self, state: dict):
+        self.summary = state.get("summary", "")
+        self._recent = deque(state.get("recent", []))
+        self._feedback = deque(state.get("feedback", []), maxlen=self._feedback.maxlen)
+        self._pending = list(state.get("pending", []))
+
+    @property
+    def pending_tokens(self) -> int:
+        return sum(estimate_tokens(t) for t in self._pending)
+
+    #Prompt context within the token budget (oldest recent segments are evicted first)
+    def build(self) -> dict:
+        while True:
+            context = {
+                "summary": self._summary_with_pending(),
+                "recent_segments": [s["text"] for s in self._recent],
+                "previous_feedback": list(self._feedback),
+            }
+            if len(self._recent) <= 1 or self.estimate(context) <= self.token_budget:
+                return context
+            self._evict_oldest()
+
+    def estimate(self, context: dict) -> int:
+        return (estimate_tokens(context["summary"])
+                + sum(estimate_tokens(t) for t in context["recent_segments"])
+                + sum(estimate_tokens(t) for t in context["previous_feedback"]))
+
+    # Summary plus not-yet-summarized evicted text, truncated to the summary cap (keeps the newest text)
+    def _summary_with_pending(self) -> str:
+        return self._truncated_summary(self._pending)
+
+    def _truncated_summary(self, texts: list) -> str:
+        text = " ".join(t for t in [self.summary, *texts] if t)
+        max_chars = self.summary_tokens * 4
+        if len(text) > max_chars:
+            text = "..." + text[-max_chars:]
+        return text
+
+    #Fold evicted segments into the summary once enough have accumulated
+    async def maybe_summarize(self):
+        if self._summarizing or self.pending_tokens < self.summarize_after_tokens:
+            return
+        self._summarizing = True
+        folded = list(self._pending)
+        try:
+            if self.summarizer is not None:
+                summary = await self.summarizer(self.summary, " ".join(folded))
+            else:
+                summary = None
+            if summary:
+                self.summary = summary.strip()
+            else:
+                self.summary = self._truncated_summary(folded)
+            # Segments evicted while the summarizer ran stay pending
+            del self._pending[:len(folded)]
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Context summarization failed: {e}")
+        finally:
+            self._summarizing = False
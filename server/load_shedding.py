@@ -0,0 +1,74 @@
+import logging
+import time
+
+import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LoadShedder:
+    # Per-stream freshness accounting and degraded-mode switch. Stages report how much of
+    # their freshness budget each piece of work used (observe) and any work they dropped
+    # because it could no longer be fresh (shed). Sustained use of most of the budget, or
+    # any shedding, switches the stream to degraded mode (fewer upstream requests per
+    # utterance); it switches back once load has stayed low for `recover_s`.
+    def __init__(self, enter_load: float = 0.75, exit_load: float = 0.4, recover_s: float = 15.0,
+                 smoothing: float = 0.3):
+        self.enter_load = enter_load
+        self.exit_load = exit_load
+        self.recover_s = recover_s
+        self.smoothing = smoothing
+
+        # Smoothed fraction of the freshness budget used by completed work
+        self.load = 0.0
+        self.degraded = False
+        self._last_shed = None
+        self._changed_at = time.monotonic()
+
+        # Counters: "stage:reason" -> items shed
+        self.shed_counts = {}
+        self.degraded_entries = 0
+
+    #Work that completed after using `elapsed_s` of its `budget_s`; returns True if the mode changed
+    def observe(self, stage: str, elapsed_s: float, budget_s: float) -> bool:
+        self.load += self.smoothing * (min(2.0, elapsed_s / budget_s) - self.load)
+        return self._update()
+
+    #Work dropped (expired, past its deadline, coalesced, over a backlog); returns True if the mode changed.
+    #pressure=False for drops that are policy rather than overload (latest-wins, degraded-mode thinning),
+    #which are reported but must not keep the stream degraded
+    def shed(self, stage: str, reason: str, pressure: bool = True) -> bool:
+        key = f"{stage}:{reason}"
+        self.shed_counts[key] = self.shed_counts.get(key, 0) + 1
+        metrics.inc("resonate_shed_total", stage=stage, reason=reason)
+        if pressure:
+            self._last_shed = time.monotonic()
+        return self._update()
+
+    #Re-evaluate the mode without new observations (e.g. recovery during a quiet stretch)
+    def poll(self) -> bool:
+        return self._update()
+
+    def _update(self) -> bool:
+        now = time.monotonic()
+        recently_shed = self._last_shed is not None and now - self._last_shed < self.recover_s
+        if not self.degraded and (self.load >= self.enter_load or recently_shed):
+            self.degraded = True
+            self.degraded_entries += 1
+        elif (self.degraded and self.load <= self.exit_load and not recently_shed
+              and now - self._changed_at >= self.recover_s):
+            self.degraded = False
+        else:
+            return False
+        self._changed_at = now
+        logger.info(f"Stream {'entered' if self.degraded else 'left'} degraded mode (load={self.load:.2f}, shed={self.shed_counts})")
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "degraded": self.degraded,
+            "load": round(self.load, 2),
+            "shed": dict(self.shed_counts),
+            "degraded_entries": self.degraded_entries,
+        }
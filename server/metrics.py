@@ -0,0 +1,188 @@
+import bisect
+import logging
+import os
+import resource
+import time
+from contextlib import nullcontext
+
+from aiohttp import web
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Prometheus-style instrumentation, off unless METRICS_ENABLED=1. When disabled, every
+# entry point returns immediately (timer() hands back one shared no-op context), so
+# instrumented code paths cost a function call and nothing else.
+ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+PORT = int(os.getenv("METRICS_PORT", "9100"))
+
+# Seconds; covers per-frame DSP (~10us) up to slow upstream calls (~30s)
+BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1,
+           0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NOOP = nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        # One slot per bucket plus +Inf
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Timer:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+# stage -> Histogram
+_stages = {}
+# (name, sorted label items) -> value
+_counters = {}
+# callables returning [(name, labels dict, value)] evaluated at scrape time
+_gauge_collectors = []
+_help = {
+    "resonate_stage_seconds": "Time spent per processing stage",
+    "resonate_upstream_requests_total": "Upstream API requests by service and outcome",
+}
+
+
+def observe(stage: str, seconds: float):
+    if not ENABLED:
+        return
+    histogram = _stages.get(stage)
+    if histogram is None:
+        histogram = _stages[stage] = Histogram()
+    histogram.observe(seconds)
+
+
+#Context manager timing a block into the stage histogram
+def timer(stage: str):
+    if not ENABLED:
+        return _NOOP
+    return _Timer(stage)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if not ENABLED:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    _counters[key] = _counters.get(key, 0) + amount
+
+
+#Count one upstream call; outcome is "ok" or "error"
+def upstream(service: str, ok: bool):
+    inc("resonate_upstream_requests_total", service=service, outcome="ok" if ok else "error")
+
+
+#Register fn() -> [(name, labels, value)]; called on every scrape
+def register_gauges(fn, help_text: dict = None):
+    _gauge_collectors.append(fn)
+    if help_text:
+        _help.update(help_text)
+
+
+def _labels(labels) -> str:
+    items = labels.items() if isinstance(labels, dict) else labels
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+def _process_gauges():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    gauges = [
+        ("process_cpu_seconds_total", {}, usage.ru_utime + usage.ru_stime),
+        ("process_max_resident_memory_bytes", {}, usage.ru_maxrss * 1024),
+    ]
+    try:
+        with open("/proc/self/statm") as f:
+            gauges.append(("process_resident_memory_bytes", {}, int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")))
+    except (OSError, ValueError):
+        pass
+    return gauges
+
+
+#Prometheus text exposition of everything recorded in this process
+def render() -> str:
+    lines = []
+    if _stages:
+        lines.append(f"# HELP resonate_stage_seconds {_help['resonate_stage_seconds']}")
+        lines.append("# TYPE resonate_stage_seconds histogram")
+        for stage, h in sorted(_stages.items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS, h.counts):
+                cumulative += count
+                lines.append(f'resonate_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'resonate_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'resonate_stage_seconds_sum{{stage="{stage}"}} {h.sum:.6f}')
+            lines.append(f'resonate_stage_seconds_count{{stage="{stage}"}} {h.count}')
+
+    seen = set()
+    for (name, labels), value in sorted(_counters.items()):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels(labels)} {value}")
+
+    gauges = list(_process_gauges())
+    for collect in _gauge_collectors:
+        try:
+            gauges.extend(collect())
+        except Exception as e:
+            logger.warning(f"Metrics collector failed: {e}")
+    # Series of one metric must be contiguous in the exposition
+    gauges.sort(key=lambda g: g[0])
+    for name, labels, value in gauges:
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+#Serve GET /metrics on METRICS_HOST (default 127.0.0.1):port; returns the aiohttp runner (None when disabled
+#or the port can't be bound). SO_REUSEPORT lets a replacement worker bind while the old one drains
+async def start_server(port: int = None):
+    if not ENABLED:
+        return None
+
+    async def handle(request):
+        return web.Response(text=render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.add_routes([web.get("/metrics", handle)])
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    host = os.getenv("METRICS_HOST", "127.0.0.1")
+    port = PORT if port is None else port
+    try:
+        await web.TCPSite(runner, host, port, reuse_port=True).start()
+    except OSError as e:
+        logger.warning(f"Metrics disabled, can't bind {host}:{port}: {e}")
+        await runner.cleanup()
+        return None
+    logger.info(f"Metrics on http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+import openai
+from openai import AsyncOpenAI
+
+import upstream_scheduler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Process-wide settings (environment overridable). Concurrency and rate budgets (and
+# with them open connections in the client's pool) are per provider, see upstream_scheduler:
+# "openai_whisper" for transcription, "openai_chat" for feedback and summaries.
+TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "30"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+RETRY_BASE_S = 0.5
+RETRY_CAP_S = 8.0
+
+# Transient failures worth another attempt
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+_client = None
+
+
+#Shared AsyncOpenAI client; one instance means one keep-alive connection pool (None if it cannot be created)
+def get_client():
+    global _client
+    if _client is None:
+        try:
+            # Retries are handled in request() so they share the concurrency budget
+            _client = AsyncOpenAI(max_retries=0, timeout=TIMEOUT_S)
+        except Exception as e:
+            logger.error(f"Failed to initialize OpenAI client: {e}")
+            return None
+    return _client
+
+
+#Exponential backoff with full jitter
+def retry_delay(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_CAP_S, RETRY_BASE_S * (2 ** attempt)))
+
+
+#Retry-After from a rate-limit response, in seconds (None if absent)
+def _retry_after_s(error) -> float:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+#Await call() (a zero-argument coroutine factory), retrying transient errors with jittered backoff.
+#Rate-limit responses also pause the provider's scheduler, so every stream backs off together.
+async def _with_retries(call, scheduler):
+    attempt = 0
+    while True:
+        try:
+            result = await call()
+            scheduler.report_success()
+            return result
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, openai.RateLimitError):
+                scheduler.report_rate_limited(_retry_after_s(e))
+            if attempt >= MAX_RETRIES:
+                raise
+            delay = retry_delay(attempt)
+            attempt += 1
+            logger.warning(f"OpenAI request failed ({type(e).__name__}), retry {attempt}/{MAX_RETRIES} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+#Run an OpenAI coroutine call once the provider's scheduler admits it, retrying transient errors.
+#priority: higher runs first among this stream's waiting requests (default: newest first).
+#deadline: time.monotonic() after which the result is worthless; waiting, the request and any
+#retries are abandoned then (UpstreamBusy / DeadlineExceeded)
+async def request(provider, method, *args, priority: float = None, deadline: float = None, **kwargs):
+    scheduler = upstream_scheduler.get(provider)
+
+    async def call():
+        async with scheduler.slot(priority, deadline):
+            return await method(*args, **kwargs)
+    if deadline is None:
+        return await _with_retries(call, scheduler)
+    try:
+        return await asyncio.wait_for(_with_retries(call, scheduler), max(0.0, deadline - time.monotonic()))
+    except asyncio.TimeoutError:
+        raise upstream_scheduler.DeadlineExceeded(f"{provider}: deadline passed before the response")
+
+
+#Streaming variant: holds a scheduler slot for the whole stream and closes the
+#HTTP response on exit (including cancellation), which frees upstream capacity
+@asynccontextmanager
+async def stream(provider, method, *args, priority: float = None, deadline: float = None, **kwargs):
+    scheduler = upstream_scheduler.get(provider)
+    async with scheduler.slot(priority, deadline):
+        response = await _with_retries(lambda: method(*args, stream=True, **kwargs), scheduler)
+        try:
+            yield response
+        finally:
+            await response.close()
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+    _client = None
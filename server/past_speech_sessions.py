@@ -1,16 +1,76 @@
+import session_log
+import state_store
 
-class SpeechSegment: 
-    def __init__(self, transcription : str, tone_analysis, id):
+class SpeechSegment:
+    # Slotted: long sessions hold many of these
+    __slots__ = ("id", "start_ms", "end_ms", "transcription", "tone_analysis", "feedback")
+
+    def __init__(self, transcription : str, tone_analysis, id, start_ms: int = 0, end_ms: int = 0, feedback: str = None):
         self.id = id
+        self.start_ms = start_ms
+        self.end_ms = end_ms
         self.tone_analysis = tone_analysis
         self.transcription = transcription
+        self.feedback = feedback
+
+    #Fold one log record (transcript / tone / feedback) into the segment
+    def apply(self, record: dict):
+        kind = record.get("kind")
+        if kind == "transcript":
+            self.transcription = record.get("text")
+        elif kind == "tone":
+            self.tone_analysis = record.get("labels")
+        elif kind == "feedback":
+            self.feedback = record.get("text")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "start_ms": self.start_ms,
+            "end_ms": self.end_ms,
+            "transcription": self.transcription,
+            "tone_analysis": self.tone_analysis,
+            "feedback": self.feedback,
+        }
 
 class TotalSession:
     def __init__(self, speech_segments, id):
-        self.id 
-        self.speech_segments = speech_segments 
+        self.id = id
+        self.speech_segments = speech_segments
+
+    #Rebuild segments from a session's log records. A session is one connection, so seq is
+    #unique within it, and every record carries its segment's span (start_ms/end_ms)
+    @classmethod
+    def from_records(cls, id, records: list):
+        segments = {}
+        for record in records:
+            seq = record.get("seq")
+            segment = segments.get(seq)
+            if segment is None:
+                segment = segments[seq] = SpeechSegment(None, None, seq, record.get("start_ms", 0), record.get("end_ms", 0))
+            segment.apply(record)
+        return cls(sorted(segments.values(), key=lambda s: (s.start_ms, s.id)), id)
+
+# Per-stream working state; lives outside process memory when SESSION_STATE_DIR is set,
+# so every ws_server worker sees the same streams
+sessions = state_store.from_env()
+
+# Durable segment history (transcript, tone labels, feedback), indexed by session (one per
+# connection, see WebSocketProcessor.session_id) and time
+segment_log = session_log.from_env()
 
-sessions = {}
+#Full history of a past session (None if nothing was recorded)
+async def getSession(id):
+    if segment_log is None:
+        return None
+    records = await segment_log.load_history(id)
+    if not records:
+        return None
+    return TotalSession.from_records(id, records)
 
-def getSession(id):
-    return sessions[id]
+#Segments of a session overlapping [start_ms, end_ms)
+async def getSessionRange(id, start_ms: int, end_ms: int):
+    if segment_log is None:
+        return None
+    records = await segment_log.load_time_range(id, start_ms, end_ms)
+    return TotalSession.from_records(id, records)
@@ -0,0 +1,163 @@
+import numpy as np
+
+from vad import EnergyVAD
+
+
+class ProsodyAnalyzer:
+    # Incremental, CPU-only prosody features over a sliding window of the live stream:
+    # loudness and its variability, pitch (YIN) and its variability, pause ratio and a
+    # speaking-rate proxy (energy peaks ~ syllable nuclei per second of speech).
+    #
+    # Audio is analysed in blocks of frames (all frames of a block in one vectorized
+    # pass) and pitch only runs on speech frames, decimated to 8 kHz, which keeps the
+    # per-stream cost around half a percent of a core.
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20, window_s: float = 3.0,
+                 update_interval_s: float = 0.25, block_ms: int = 100, fmin_hz: float = 75.0,
+                 fmax_hz: float = 400.0, yin_threshold: float = 0.15):
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.frame_s = frame_ms / 1000.0
+        self.window_frames = int(window_s / self.frame_s)
+        self.update_frames = max(1, int(update_interval_s / self.frame_s))
+        self.block_frames = max(1, int(block_ms / frame_ms))
+        self.vad = EnergyVAD()
+
+        # Pitch runs at 8 kHz on two-frame (40ms) windows
+        self.decimate = max(1, sample_rate // 8000)
+        self.pitch_rate = sample_rate / self.decimate
+        self.tau_min = int(self.pitch_rate / fmax_hz)
+        self.tau_max = int(self.pitch_rate / fmin_hz)
+        self.yin_window = 2 * self.frame_len // self.decimate - self.tau_max
+        self.yin_threshold = yin_threshold
+        self._fft_len = 1 << int(np.ceil(np.log2(2 * self.frame_len // self.decimate)))
+
+        # Unanalysed tail, and the previous frame (first half of the next pitch window)
+        self._pending = np.empty(0, dtype=np.float32)
+        self._prev_frame = np.zeros(self.frame_len, dtype=np.float32)
+
+        # Per-frame history over the window
+        self._level_db = np.empty(0, dtype=np.float32)
+        self._speech = np.empty(0, dtype=bool)
+        self._f0 = np.empty(0, dtype=np.float32)
+
+        self._frames_since_update = 0
+        self.latest = None
+
+    #Feed samples (float32, stream rate); returns a metrics snapshot when an update is due, else None
+    def push(self, samples: np.ndarray):
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        n_frames = len(samples) // self.frame_len
+        if n_frames < self.block_frames:
+            self._pending = np.array(samples, dtype=np.float32)
+            return None
+        used = n_frames * self.frame_len
+        self._pending = samples[used:].astype(np.float32)
+        frames = np.asarray(samples[:used], dtype=np.float32).reshape(n_frames, self.frame_len)
+
+        energy = np.einsum("ij,ij->i", frames, frames) / self.frame_len
+        level_db = (10.0 * np.log10(energy + 1e-10)).astype(np.float32)
+        speech = self.vad.classify(frames)
+        f0 = np.full(n_frames, np.nan, dtype=np.float32)
+        if speech.any():
+            f0[speech] = self._pitch(frames, speech)
+        self._prev_frame = frames[-1].copy()
+
+        keep = self.window_frames
+        self._level_db = np.concatenate((self._level_db, level_db))[-keep:]
+        self._speech = np.concatenate((self._speech, speech))[-keep:]
+        self._f0 = np.concatenate((self._f0, f0))[-keep:]
+
+        self._frames_since_update += n_frames
+        if self._frames_since_update < self.update_frames:
+            return None
+        self._frames_since_update = 0
+        self.latest = self.snapshot()
+        return self.latest
+
+    #YIN fundamental frequency (Hz, NaN if unvoiced) for the selected frames of a block
+    def _pitch(self, frames: np.ndarray, selected: np.ndarray) -> np.ndarray:
+        # 40ms analysis windows: each frame plus the one before it
+        previous = np.concatenate((self._prev_frame[None, :], frames[:-1]))
+        windows = np.concatenate((previous[selected], frames[selected]), axis=1)
+        if self.decimate > 1:
+            # Pairwise mean: crude low-pass, adequate below 1 kHz where pitch lives
+            windows = windows.reshape(len(windows), -1, self.decimate).mean(axis=2)
+        windows = windows - windows.mean(axis=1, keepdims=True)
+
+        w = self.yin_window
+        taus = np.arange(self.tau_max + 1)
+        # Difference function d(tau) = E(x[0:w]) + E(x[tau:tau+w]) - 2 r(tau), with r via FFT
+        spectrum = np.fft.rfft(windows, self._fft_len, axis=1)
+        head = np.fft.rfft(windows[:, :w], self._fft_len, axis=1)
+        r = np.fft.irfft(np.conj(head) * spectrum, self._fft_len, axis=1)[:, :self.tau_max + 1]
+        sq = np.concatenate((np.zeros((len(windows), 1)), np.cumsum(windows ** 2, axis=1)), axis=1)
+        energy_shifted = sq[:, taus + w] - sq[:, taus]
+        diff = np.maximum(energy_shifted[:, :1] + energy_shifted - 2.0 * r, 0.0)
+
+        # Cumulative mean normalized difference
+        cmnd = np.ones_like(diff)
+        running = np.cumsum(diff[:, 1:], axis=1)
+        cmnd[:, 1:] = diff[:, 1:] * taus[1:] / np.maximum(running, 1e-12)
+
+        # First dip below the threshold, refined to its local minimum (within half a period)
+        search = cmnd[:, self.tau_min:]
+        below = search < self.yin_threshold
+        voiced = below.any(axis=1)
+        first = np.argmax(below, axis=1)
+        span = max(1, self.tau_min // 2)
+        offsets = np.arange(span)
+        idx = np.minimum(first[:, None] + offsets[None, :], search.shape[1] - 1)
+        best = first + np.argmin(np.take_along_axis(search, idx, axis=1), axis=1)
+        tau = (best + self.tau_min).astype(np.float64)
+
+        # Parabolic interpolation around the minimum
+        lo = np.clip(best - 1, 0, search.shape[1] - 1)
+        hi = np.clip(best + 1, 0, search.shape[1] - 1)
+        rows = np.arange(len(search))
+        a, b, c = search[rows, lo], search[rows, best], search[rows, hi]
+        denom = a - 2 * b + c
+        tau += np.where(np.abs(denom) > 1e-12, 0.5 * (a - c) / np.where(denom == 0, 1, denom), 0.0)
+
+        return np.where(voiced, self.pitch_rate / tau, np.nan).astype(np.float32)
+
+    #Metrics over the current window (None values when there is too little speech)
+    def snapshot(self) -> dict:
+        total = len(self._speech)
+        speech = self._speech
+        n_speech = int(speech.sum())
+        metrics = {
+            "window_s": round(total * self.frame_s, 2),
+            "pause_ratio": round(1.0 - n_speech / total, 3) if total else None,
+            "energy_db": None,
+            "volume_variability_db": None,
+            "pitch_hz": None,
+            "pitch_variability_st": None,
+            "speaking_rate_sps": None,
+        }
+        if n_speech < 5:
+            return metrics
+
+        levels = self._level_db[speech]
+        metrics["energy_db"] = round(float(levels.mean()), 1)
+        metrics["volume_variability_db"] = round(float(levels.std()), 1)
+
+        f0 = self._f0[speech]
+        f0 = f0[np.isfinite(f0)]
+        if len(f0) >= 5:
+            median = float(np.median(f0))
+            metrics["pitch_hz"] = round(median, 1)
+            metrics["pitch_variability_st"] = round(float(np.std(12.0 * np.log2(f0 / median))), 2)
+
+        # Syllable proxy: local maxima of the energy envelope during speech, at least 3 dB
+        # above the surrounding 100ms valleys
+        speech_s = n_speech * self.frame_s
+        if speech_s >= 0.5 and total >= 7:
+            env = np.convolve(self._level_db, np.ones(3, dtype=np.float32) / 3.0, mode="same")
+            windows = np.lib.stride_tricks.sliding_window_view(env, 7)
+            center = windows[:, 3]
+            # Strict rise from the previous frame: a plateau counts once
+            peaks = ((center == windows.max(axis=1)) & (center > windows[:, 2])
+                     & (center - windows.min(axis=1) >= 3.0) & speech[3:-3])
+            metrics["speaking_rate_sps"] = round(float(peaks.sum()) / speech_s, 2)
+        return metrics
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    # Content-addressed cache for upstream results (transcripts, tone analyses).
+    # Keys hash the quantized PCM plus the request parameters, so identical or
+    # near-identical audio (silence, hold tones, replays) is only sent upstream once.
+    # Tier 1 is an in-memory LRU; tier 2 is an optional directory of JSON files.
+    def __init__(self, name: str, max_entries: int = 1024, ttl_s: float = 3600.0, disk_dir: str = None,
+                 quantize_bits: int = 4):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.disk_dir = os.path.join(disk_dir, name) if disk_dir else None
+        # Low-order int16 bits dropped before hashing (absorbs dither / codec noise)
+        self.quantize_bits = quantize_bits
+        self._entries = OrderedDict()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    #Cache key for an AudioSegment (or float chunk in [-1, 1]) and the parameters that affect the result
+    def key(self, audio, **params) -> str:
+        pcm = getattr(audio, "pcm", None)
+        if pcm is None:
+            pcm = (np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0) * 32767.0).astype(np.int16)
+        quantized = pcm >> self.quantize_bits
+        digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+        digest.update(json.dumps(params, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    #Memory tier lookup; returns None on miss or expiry
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if time.time() - created > self.ttl_s:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value):
+        self._entries[key] = (time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    #Memory, then disk (off the event loop); counts one hit or miss per lookup
+    async def lookup(self, key: str):
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                created, value = entry
+                self._entries[key] = (created, value)
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    async def store(self, key: str, value):
+        self.put(key, value)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, value)
+            except Exception as e:
+                logger.warning(f"[{self.name}] disk cache write failed: {e}")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        created = entry.get("created", 0)
+        if time.time() - created > self.ttl_s:
+            self.expirations += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return created, entry.get("value")
+
+    def _write_disk(self, key: str, value):
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"created": time.time(), "value": value}, f)
+        os.replace(tmp, self._path(key))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+# Caches created by from_env, by name; exported as gauges on every scrape
+_caches = {}
+
+
+#Cache configured from the environment (RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL_S, RESULT_CACHE_DIR)
+def from_env(name: str):
+    if os.getenv("RESULT_CACHE_ENABLED", "1") != "1":
+        return None
+    cache = _caches[name] = ResultCache(
+        name,
+        max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024")),
+        ttl_s=float(os.getenv("RESULT_CACHE_TTL_S", "3600")),
+        disk_dir=os.getenv("RESULT_CACHE_DIR") or None,
+    )
+    return cache
+
+
+def _cache_gauges():
+    gauges = []
+    for name, cache in _caches.items():
+        labels = {"cache": name}
+        gauges.append(("resonate_cache_entries", labels, len(cache._entries)))
+        gauges.append(("resonate_cache_hits_total", labels, cache.hits))
+        gauges.append(("resonate_cache_disk_hits_total", labels, cache.disk_hits))
+        gauges.append(("resonate_cache_misses_total", labels, cache.misses))
+        gauges.append(("resonate_cache_evictions_total", labels, cache.evictions))
+        gauges.append(("resonate_cache_expirations_total", labels, cache.expirations))
+    return gauges
+
+metrics.register_gauges(_cache_gauges, {
+    "resonate_cache_entries": "Results held in the memory tier per cache",
+    "resonate_cache_hits_total": "Lookups answered from the cache (memory or disk)",
+    "resonate_cache_disk_hits_total": "Lookups answered from the disk tier",
+    "resonate_cache_misses_total": "Lookups that went upstream",
+    "resonate_cache_evictions_total": "Results evicted from the memory tier (LRU)",
+    "resonate_cache_expirations_total": "Results dropped after their TTL",
+})
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import struct
+
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Index entry per log record: segment start (ms), segment end (ms), byte offset in the log
+INDEX_ENTRY = struct.Struct("<qqq")
+INDEX_DTYPE = np.dtype([("start_ms", "<i8"), ("end_ms", "<i8"), ("offset", "<i8")])
+
+
+class SessionLog:
+    # Durable, append-only record log with one pair of files per session:
+    #   <session>.log  JSON lines (transcript / tone / feedback records, in arrival order)
+    #   <session>.idx  fixed-size binary entries (start_ms, end_ms, offset), one per record
+    # Reading a session's history is one sequential read; a time range is answered from
+    # the index (24 bytes per record) and only the matching lines are read from the log.
+    # Writes are queued and flushed by a background task, off the event loop.
+    _unsafe = re.compile(r"[^A-Za-z0-9_.-]")
+
+    def __init__(self, root: str, flush_batch: int = 256):
+        self.root = root
+        self.flush_batch = flush_batch
+        os.makedirs(root, exist_ok=True)
+        self._queue = None
+        self._writer = None
+
+        # Counters
+        self.appended = 0
+        self.written = 0
+        self.write_errors = 0
+
+    def _base(self, session_id: str) -> str:
+        return os.path.join(self.root, self._unsafe.sub("_", str(session_id)))
+
+    #Queue one record (dict with start_ms/end_ms) for a session; never blocks the caller
+    def append(self, session_id: str, record: dict):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+        self._queue.put_nowait((session_id, record))
+        self.appended += 1
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.flush_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+                self.written += len(batch)
+            except OSError as e:
+                self.write_errors += len(batch)
+                logger.warning(f"Session log write failed ({len(batch)} records): {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list):
+        by_session = {}
+        for session_id, record in batch:
+            by_session.setdefault(session_id, []).append(record)
+        for session_id, records in by_session.items():
+            base = self._base(session_id)
+            with open(base + ".log", "ab") as log, open(base + ".idx", "ab") as idx:
+                offset = log.tell()
+                lines = []
+                entries = []
+                for record in records:
+                    line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+                    entries.append(INDEX_ENTRY.pack(int(record.get("start_ms", 0)), int(record.get("end_ms", 0)), offset))
+                    lines.append(line)
+                    offset += len(line)
+                # Log first: an index entry never points past the end of the log
+                log.write(b"".join(lines))
+                log.flush()
+                idx.write(b"".join(entries))
+
+    #Wait until every queued record is on disk
+    async def flush(self):
+        if self._queue is not None and self._writer is not None and not self._writer.done():
+            await self._queue.join()
+
+    async def close(self):
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    #Array-backed index of a session (empty if the session is unknown)
+    def index(self, session_id: str) -> np.ndarray:
+        try:
+            with open(self._base(session_id) + ".idx", "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return np.empty(0, dtype=INDEX_DTYPE)
+        usable = len(raw) - len(raw) % INDEX_ENTRY.size
+        return np.frombuffer(raw[:usable], dtype=INDEX_DTYPE)
+
+    #All records of a session, in append order
+    def history(self, session_id: str) -> list:
+        try:
+            with open(self._base(session_id) + ".log", "rb") as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    #Records whose segment overlaps [start_ms, end_ms)
+    def time_range(self, session_id: str, start_ms: int, end_ms: int) -> list:
+        idx = self.index(session_id)
+        offsets = idx["offset"][(idx["start_ms"] < end_ms) & (idx["end_ms"] >= start_ms)]
+        if not len(offsets):
+            return []
+        records = []
+        with open(self._base(session_id) + ".log", "rb") as f:
+            for offset in offsets:
+                f.seek(int(offset))
+                records.append(json.loads(f.readline()))
+        return records
+
+    async def load_history(self, session_id: str) -> list:
+        return await asyncio.to_thread(self.history, session_id)
+
+    async def load_time_range(self, session_id: str, start_ms: int, end_ms: int) -> list:
+        return await asyncio.to_thread(self.time_range, session_id, start_ms, end_ms)
+
+    def stats(self) -> dict:
+        return {
+            "appended": self.appended,
+            "written": self.written,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "write_errors": self.write_errors,
+        }
+
+
+#Segment log under SESSION_LOG_DIR (default ./session_logs); SESSION_LOG_ENABLED=0 turns it off
+def from_env():
+    if os.getenv("SESSION_LOG_ENABLED", "1") != "1":
+        return None
+    return SessionLog(os.getenv("SESSION_LOG_DIR", "session_logs"))
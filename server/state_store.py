@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import uuid
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MemoryStateStore:
+    # Process-local store (single worker / development). Items not written for `ttl_s`
+    # (abandoned streams that never reconnected) expire; ttl_s=0 keeps them forever.
+    def __init__(self, ttl_s: float = 0):
+        self.ttl_s = ttl_s
+        # key -> (written at, value)
+        self._items = {}
+        self._next_sweep = 0.0
+
+    def _expired(self, written_at: float, now: float) -> bool:
+        return self.ttl_s > 0 and now - written_at > self.ttl_s
+
+    def get(self, key: str):
+        item = self._items.get(key)
+        if item is None:
+            return None
+        if self._expired(item[0], time.monotonic()):
+            del self._items[key]
+            return None
+        return item[1]
+
+    def put(self, key: str, value: dict):
+        now = time.monotonic()
+        self._items[key] = (now, value)
+        if self.ttl_s > 0 and now >= self._next_sweep:
+            self._next_sweep = now + min(60.0, self.ttl_s)
+            for stale in [k for k, (written_at, _) in self._items.items() if self._expired(written_at, now)]:
+                del self._items[stale]
+
+    def delete(self, key: str):
+        self._items.pop(key, None)
+
+    async def load(self, key: str):
+        return self.get(key)
+
+    async def save(self, key: str, value: dict):
+        self.put(key, value)
+
+    async def remove(self, key: str):
+        self.delete(key)
+
+
+class DirectoryStateStore:
+    # One JSON document per key in a shared directory, so any worker process on the
+    # host (or any host mounting the directory) can pick up a stream's state.
+    # Writes are atomic (temp file + rename); async methods run the I/O off the event loop.
+    # Documents not written for `ttl_s` (by file mtime) expire; ttl_s=0 keeps them forever.
+    _unsafe = re.compile(r"[^A-Za-z0-9_.-]")
+
+    def __init__(self, root: str, ttl_s: float = 0):
+        self.root = root
+        self.ttl_s = ttl_s
+        self._next_sweep = 0.0
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, self._unsafe.sub("_", key) + ".json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            if self.ttl_s > 0 and time.time() - os.path.getmtime(path) > self.ttl_s:
+                self.delete(key)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"State read failed for {key}: {e}")
+            return None
+
+    def put(self, key: str, value: dict):
+        path = self._path(key)
+        # Unique per write: saves of one key can overlap (worker threads, other processes)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        if self.ttl_s > 0 and time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + min(60.0, self.ttl_s)
+            self.sweep()
+
+    #Remove expired documents (and temp files left by interrupted writes)
+    def sweep(self):
+        cutoff = time.time() - self.ttl_s
+        for name in os.listdir(self.root):
+            if not name.endswith((".json", ".tmp")):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def load(self, key: str):
+        return await asyncio.to_thread(self.get, key)
+
+    async def save(self, key: str, value: dict):
+        try:
+            await asyncio.to_thread(self.put, key, value)
+        except OSError as e:
+            logger.warning(f"State write failed for {key}: {e}")
+
+    async def remove(self, key: str):
+        try:
+            await asyncio.to_thread(self.delete, key)
+        except OSError as e:
+            logger.warning(f"State delete failed for {key}: {e}")
+
+
+#Shared directory store when SESSION_STATE_DIR is set (required for multi-worker resume), else in-process.
+#SESSION_STATE_TTL_S (default 1h) is how long a disconnected stream's state is kept for it to resume
+def from_env():
+    root = os.getenv("SESSION_STATE_DIR")
+    ttl_s = float(os.getenv("SESSION_STATE_TTL_S", "3600"))
+    if root:
+        return DirectoryStateStore(root, ttl_s)
+    return MemoryStateStore(ttl_s)
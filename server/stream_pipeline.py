@@ -0,0 +1,129 @@
+import asyncio
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Queue-full policies
+BLOCK = "block"              # producer waits (backpressure)
+DROP_OLDEST = "drop_oldest"  # evict the stalest item, keep the new one
+DROP_NEWEST = "drop_newest"  # reject the new item
+
+
+class BoundedQueue:
+    def __init__(self, name: str, maxsize: int, policy: str = BLOCK):
+        if policy not in (BLOCK, DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self._queue = asyncio.Queue(maxsize)
+
+        # Counters
+        self.enqueued = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    #Enqueue without waiting; returns False if the new item was dropped
+    def put_nowait(self, item) -> bool:
+        if self._queue.full():
+            if self.policy == DROP_OLDEST:
+                self._queue.get_nowait()
+                self._queue.task_done()
+                self.dropped += 1
+            else:
+                # BLOCK callers that cannot wait fall back to rejecting the item
+                self.dropped += 1
+                return False
+        self._queue.put_nowait(item)
+        self._record_put()
+        return True
+
+    #Enqueue, waiting for space only under the BLOCK policy
+    async def put(self, item) -> bool:
+        if self.policy != BLOCK:
+            return self.put_nowait(item)
+        await self._queue.put(item)
+        self._record_put()
+        return True
+
+    async def get(self):
+        return await self._queue.get()
+
+    def task_done(self):
+        self._queue.task_done()
+
+    async def join(self):
+        await self._queue.join()
+
+    def _record_put(self):
+        self.enqueued += 1
+        if self._queue.qsize() > self.high_water:
+            self.high_water = self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "high_water": self.high_water,
+        }
+
+
+class StreamPipeline:
+    # Chain of stages, each a single worker task consuming its own BoundedQueue.
+    # Stages hand work downstream by putting into the next stage's queue.
+    def __init__(self, name: str = "stream"):
+        self.name = name
+        self._stages = []
+        self._tasks = []
+
+    #Register a stage; returns its input queue
+    def add_stage(self, name: str, handler, maxsize: int, policy: str = BLOCK) -> BoundedQueue:
+        queue = BoundedQueue(name, maxsize, policy)
+        self._stages.append((name, queue, handler))
+        return queue
+
+    def start(self):
+        if self._tasks:
+            return
+        for name, queue, handler in self._stages:
+            self._tasks.append(asyncio.create_task(self._run_stage(name, queue, handler)))
+
+    async def _run_stage(self, name, queue, handler):
+        while True:
+            item = await queue.get()
+            try:
+                await handler(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[{self.name}] stage '{name}' failed: {e}")
+            finally:
+                queue.task_done()
+
+    #Wait until every queued item has been handled, stage by stage
+    async def drain(self, timeout: float = None):
+        async def _drain_all():
+            for _, queue, _ in self._stages:
+                await queue.join()
+        try:
+            await asyncio.wait_for(_drain_all(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[{self.name}] drain timed out: {self.stats()}")
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    #Queue depths and drop counters per stage
+    def stats(self) -> dict:
+        return {name: queue.stats() for name, queue, _ in self._stages}
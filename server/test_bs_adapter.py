@@ -0,0 +1,90 @@
+import asyncio
+import socket
+
+import numpy as np
+from aiohttp import web
+
+import bs_adapter
+import metrics
+from audio_utils import AudioSegment
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _serve(routes):
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    port = _free_port()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def _analyzer(base_url: str, monkeypatch) -> bs_adapter.ToneAnalyzer:
+    monkeypatch.setenv("BEHAVIORAL_SIGNALS_API_BASE_URL", base_url)
+    monkeypatch.setenv("BEHAVIORAL_SIGNALS_API_CID", "test")
+    monkeypatch.setattr(bs_adapter, "tone_cache", None)
+    analyzer = bs_adapter.ToneAnalyzer()
+    analyzer.poll_timeout_s = 2.0
+    return analyzer
+
+
+def _chunk() -> AudioSegment:
+    return AudioSegment(np.zeros(16000, dtype=np.int16))
+
+
+def test_error_page_from_submit_is_a_failed_analysis(monkeypatch):
+    async def not_found(request):
+        return web.Response(status=404, text="<html>Not Found</html>", content_type="text/html")
+
+    async def run():
+        runner, base_url = await _serve([web.post("/{tail:.*}", not_found)])
+        try:
+            analyzer = _analyzer(base_url, monkeypatch)
+            assert await analyzer.analyze_chunk(_chunk()) == {}
+            assert analyzer.last_status_code == 404
+        finally:
+            await bs_adapter.close_http_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_poll_errors_are_retried_until_results(monkeypatch):
+    # Timed the way a server with METRICS_ENABLED=1 times it
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    polls = []
+
+    async def submit(request):
+        return web.json_response({"pid": 7})
+
+    async def poll(request):
+        polls.append(request.path)
+        if len(polls) == 1:
+            return web.Response(status=503, text="busy")
+        return web.json_response({"status": 2})
+
+    async def results(request):
+        return web.json_response({"results": [{"task": "emotion", "finalLabel": "happy"}]})
+
+    async def run():
+        runner, base_url = await _serve([
+            web.post("/clients/{cid}/processes/audio", submit),
+            web.get("/clients/{cid}/processes/{pid}/results", results),
+            web.get("/clients/{cid}/processes/{pid}", poll),
+        ])
+        try:
+            analyzer = _analyzer(base_url, monkeypatch)
+            data = await analyzer.analyze_chunk(_chunk())
+            assert [label for _, label, _ in bs_adapter.iter_final_labels(data)] == ["happy"]
+            assert len(polls) == 2
+        finally:
+            await bs_adapter.close_http_session()
+            await runner.cleanup()
+
+    asyncio.run(run())
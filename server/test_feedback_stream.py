@@ -0,0 +1,66 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import openai_client
+import ws_processor
+from ws_processor import WebSocketProcessor
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, frame):
+        self.frames.append(json.loads(frame))
+
+
+def _chunk(text):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def _fake_stream(chunks, error=None):
+    @asynccontextmanager
+    async def stream(provider, method, *args, **kwargs):
+        async def response():
+            for chunk in chunks:
+                yield chunk
+            if error is not None:
+                raise error
+        yield response()
+    return stream
+
+
+def _processor(monkeypatch, stream):
+    monkeypatch.setattr(openai_client, "get_client", lambda: SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=None))))
+    monkeypatch.setattr(openai_client, "stream", stream)
+    monkeypatch.setattr(ws_processor.past_speech_sessions, "segment_log", None)
+    processor = WebSocketProcessor(RecordingSocket(), None, None)
+    processor.stream_id = "test"
+    processor.stream_feedback = True
+    return processor
+
+
+def _feedback(processor):
+    item = (1, (0, 1000), processor.assemble_llm_input("hello there"), time.monotonic())
+    asyncio.run(processor.handle_gpt_feedback(item))
+    return [frame["type"] for frame in processor.websocket.frames]
+
+
+def test_complete_stream_is_committed(monkeypatch):
+    processor = _processor(monkeypatch, _fake_stream([_chunk("Slow "), _chunk("down.")]))
+
+    assert _feedback(processor) == ["ai_feedback_delta", "ai_feedback_delta", "ai_feedback"]
+    assert processor.websocket.frames[-1]["feedback"] == "Slow down."
+    assert list(processor.gpt_responses) == ["Slow down."]
+
+
+def test_failed_stream_is_cancelled_not_committed(monkeypatch):
+    processor = _processor(monkeypatch, _fake_stream([_chunk("Slow ")], RuntimeError("connection reset")))
+
+    assert _feedback(processor) == ["ai_feedback_delta", "ai_feedback_cancelled"]
+    assert list(processor.gpt_responses) == []
+    assert processor.llm_context.to_dict()["feedback"] == []
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from loadtest import linear_to_mulaw
+from vad import SpeechSegment
+from ws_processor import WebSocketProcessor
+
+
+class NullSocket:
+    async def send(self, frame):
+        pass
+
+
+def _mulaw(signal: np.ndarray) -> bytes:
+    return linear_to_mulaw((signal * 32767).astype(np.int16)).tobytes()
+
+
+#Continuous voiced signal (no pauses)
+def _speech(seconds: float, rng) -> bytes:
+    t = np.arange(int(seconds * 16000)) / 16000
+    signal = 0.3 * np.sin(2 * np.pi * 180 * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+    return _mulaw(signal + rng.normal(0.0, 0.01, len(t)))
+
+
+def test_large_frame_keeps_the_open_segment_buffered():
+    async def run():
+        processor = WebSocketProcessor(NullSocket(), None, None)
+        dispatched = []
+        processor.schedule_tone_windows = lambda seq, span, audio_chunk, dispatched_at: dispatched.append(len(audio_chunk))
+        rng = np.random.default_rng(0)
+
+        # An utterance already open from regular 20ms frames (after a quiet lead-in for the VAD)...
+        frames = _mulaw(rng.normal(0.0, 2e-4, 16000)) + _speech(4, rng)
+        for i in range(0, len(frames), 320):
+            await processor.process_audio_bytes(frames[i:i + 320])
+        # ...then a backlog delivered as one frame, longer than the ring buffer
+        assert processor.segmenter.in_speech
+        await processor.process_audio_bytes(_speech(20, rng))
+        await processor.process_audio_bytes(None)
+
+        max_segment = int(processor.max_segment_s * processor.sample_rate)
+        # Every forced cut is a whole segment, and no speech went missing
+        assert dispatched[:2] == [max_segment, max_segment]
+        assert sum(dispatched) >= 24 * processor.sample_rate
+        await processor.close()
+
+    asyncio.run(run())
+
+
+def test_segment_older_than_the_buffer_is_clamped():
+    async def run():
+        processor = WebSocketProcessor(NullSocket(), None, None)
+        dispatched = []
+        processor.schedule_tone_windows = lambda seq, span, audio_chunk, dispatched_at: dispatched.append(len(audio_chunk))
+        capacity = processor.audio_buffer.capacity
+        processor.audio_buffer.write(np.zeros(capacity + 16000, dtype=np.float32))
+
+        processor.dispatch_segment(SpeechSegment(0, capacity + 16000, capacity, True))
+        assert dispatched == [capacity]
+        await processor.close()
+
+    asyncio.run(run())
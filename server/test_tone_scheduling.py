@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import numpy as np
+
+import tone_timeline
+from audio_utils import AudioSegment
+from ws_processor import WebSocketProcessor
+
+
+class BlockingAnalyzer:
+    # Holds every analysis until released
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = 0
+
+    async def analyze_chunk(self, audio_chunk, deadline=None):
+        self.started += 1
+        await self.release.wait()
+        return []
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def _processor(analyzer):
+    processor = WebSocketProcessor(None, None, analyzer)
+    processor.tone_max_in_flight = 1
+    processor.tone_slots = asyncio.Semaphore(1)
+    processor.tone_window_s = processor.tone_hop_s = 1.0
+    return processor
+
+
+def _utterance(seconds: float) -> AudioSegment:
+    return AudioSegment(np.zeros(int(seconds * 16000), dtype=np.int16))
+
+
+def test_degraded_keeps_newest_window_and_resolves_skipped_ones():
+    async def run():
+        analyzer = BlockingAnalyzer()
+        processor = _processor(analyzer)
+        processor.shedder.degraded = True
+
+        for seq in range(1, 4):
+            processor.schedule_tone_windows(seq, (seq * 1000, seq * 1000 + 1000), _utterance(1), time.monotonic())
+            await _settle()
+
+        windows = [window for window, _ in processor.bs_tasks]
+        # Window 1 holds the slot, window 2 was skipped for window 3, the newest
+        assert [window.seq for window in windows] == [1, 3]
+
+        analyzer.release.set()
+        await asyncio.gather(*(task for _, task in processor.bs_tasks))
+        # Nothing left pending behind the skipped window
+        assert processor.tone_timeline.pending == 0
+        assert processor.tone_timeline.counts[tone_timeline.SKIPPED] == 1
+        assert analyzer.started == 2
+        await processor.close()
+
+    asyncio.run(run())
+
+
+def test_backlog_skips_oldest_waiting_windows():
+    async def run():
+        analyzer = BlockingAnalyzer()
+        processor = _processor(analyzer)
+        processor.tone_max_backlog = 2
+
+        processor.schedule_tone_windows(1, (0, 5000), _utterance(5), time.monotonic())
+        await _settle()
+
+        assert [window.seq for window, _ in processor.bs_tasks] == [3, 4, 5]
+        assert processor.tone_timeline.counts[tone_timeline.SKIPPED] == 2
+
+        analyzer.release.set()
+        await asyncio.gather(*(task for _, task in processor.bs_tasks))
+        assert processor.tone_timeline.pending == 0
+        await processor.close()
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+import tone_timeline
+from tone_timeline import ToneTimeline
+
+
+def test_window_offsets_cover_the_whole_chunk():
+    assert tone_timeline.window_offsets(100, 100, 50) == [(0, 100)]
+    assert tone_timeline.window_offsets(250, 100, 50) == [(0, 100), (50, 150), (100, 200), (150, 250)]
+    assert tone_timeline.window_offsets(230, 100, 100) == [(0, 100), (100, 200), (130, 230)]
+
+
+def test_resolve_commits_in_window_order():
+    timeline = ToneTimeline()
+    first, second, third = (timeline.open(1, start, start + 1000) for start in (0, 500, 1000))
+
+    assert timeline.resolve(third, tone_timeline.OK, {"emotion": "happy"}) == []
+    assert timeline.resolve(second, tone_timeline.OK, {"emotion": "sad"}) == []
+    assert timeline.pending == 3
+
+    committed = timeline.resolve(first, tone_timeline.OK, {"emotion": "neutral"})
+    assert [w.seq for w in committed] == [first.seq, second.seq, third.seq]
+    # The newest window wins even though it finished first
+    assert timeline.labels == {"emotion": "happy"}
+    assert [w.merged["emotion"] for w in committed] == ["neutral", "sad", "happy"]
+    assert timeline.pending == 0
+    assert timeline.out_of_order == 2
+
+
+def test_skipped_window_unblocks_later_windows():
+    timeline = ToneTimeline()
+    first, second = timeline.open(1, 0, 1000), timeline.open(1, 500, 1500)
+
+    assert timeline.resolve(second, tone_timeline.OK, {"emotion": "happy"}) == []
+    committed = timeline.resolve(first, tone_timeline.SKIPPED, {"emotion": "sad"})
+    assert [w.seq for w in committed] == [first.seq, second.seq]
+    assert first.labels is None
+    assert timeline.labels == {"emotion": "happy"}
+    assert timeline.stats() == {"ok": 1, "failed": 0, "skipped": 1, "pending": 0, "out_of_order": 1}
+
+
+def test_first_outcome_wins():
+    timeline = ToneTimeline()
+    window = timeline.open(1, 0, 1000)
+
+    assert timeline.resolve(window, tone_timeline.SKIPPED) == [window]
+    # e.g. the cancelled task's own cleanup running afterwards
+    assert timeline.resolve(window, tone_timeline.OK, {"emotion": "happy"}) == []
+    assert window.status == tone_timeline.SKIPPED
+    assert timeline.counts[tone_timeline.SKIPPED] == 1
+    assert timeline.labels == {}
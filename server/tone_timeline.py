@@ -0,0 +1,101 @@
+from collections import deque
+
+# Window outcomes
+OK = "ok"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+#(start, end) sample offsets of tone windows covering `length` samples: `window` long,
+#`hop` apart, the last one aligned to the end so no audio is left out
+def window_offsets(length: int, window: int, hop: int) -> list:
+    if length <= window:
+        return [(0, length)]
+    offsets = [(start, start + window) for start in range(0, length - window + 1, hop)]
+    if offsets[-1][1] < length:
+        offsets.append((length - window, length))
+    return offsets
+
+
+class ToneWindow:
+    __slots__ = ("seq", "segment_seq", "segment_span", "start_ms", "end_ms", "status", "labels", "merged", "started")
+
+    def __init__(self, seq: int, segment_seq: int, start_ms: int, end_ms: int, segment_span: tuple = None):
+        self.seq = seq
+        self.segment_seq = segment_seq
+        # (start_ms, end_ms) of the whole segment the window was cut from
+        self.segment_span = segment_span or (start_ms, end_ms)
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.status = None
+        # This window's own labels, and the stream's labels as of this window (see ToneTimeline.labels)
+        self.labels = None
+        self.merged = None
+        # Set once its upstream request has been admitted
+        self.started = False
+
+    def to_dict(self) -> dict:
+        return {
+            "seq": self.seq,
+            "segment_seq": self.segment_seq,
+            "start_ms": self.start_ms,
+            "end_ms": self.end_ms,
+            "status": self.status,
+            "labels": self.labels,
+        }
+
+
+class ToneTimeline:
+    # Per-stream tone results in capture order. Windows get sequence ids when they are cut
+    # and are analyzed concurrently; a result is committed only once every earlier window
+    # has resolved (ok, failed or skipped), so `labels` (latest label per task, folded in
+    # window order) never lets an older window that finished late overwrite a newer one.
+    def __init__(self, max_windows: int = 256):
+        self._next_seq = 0
+        # seq -> window, resolved but waiting on an earlier window
+        self._resolved = {}
+        self._committed_seq = 0
+        self.windows = deque(maxlen=max_windows)
+        self.labels = {}
+
+        # Counters
+        self.counts = {OK: 0, FAILED: 0, SKIPPED: 0}
+        self.out_of_order = 0
+
+    @property
+    def pending(self) -> int:
+        return self._next_seq - self._committed_seq
+
+    #Register the next window of the stream
+    def open(self, segment_seq: int, start_ms: int, end_ms: int, segment_span: tuple = None) -> ToneWindow:
+        self._next_seq += 1
+        return ToneWindow(self._next_seq, segment_seq, start_ms, end_ms, segment_span)
+
+    #Record a window's outcome; returns the windows committed as a result, in sequence order
+    def resolve(self, window: ToneWindow, status: str, labels: dict = None) -> list:
+        if window.status is not None:
+            return []
+        window.status = status
+        window.labels = labels if status == OK else None
+        if window.seq != self._committed_seq + 1:
+            self.out_of_order += 1
+        self._resolved[window.seq] = window
+
+        committed = []
+        while self._committed_seq + 1 in self._resolved:
+            window = self._resolved.pop(self._committed_seq + 1)
+            self._committed_seq = window.seq
+            self.counts[window.status] += 1
+            if window.labels:
+                self.labels.update(window.labels)
+            window.merged = dict(self.labels)
+            self.windows.append(window)
+            committed.append(window)
+        return committed
+
+    def stats(self) -> dict:
+        return {
+            **self.counts,
+            "pending": self.pending,
+            "out_of_order": self.out_of_order,
+        }
@@ -0,0 +1,208 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Stream on whose behalf upstream calls in this context are made. Set once per
+# WebSocketProcessor; tasks it creates inherit it, so adapters need no extra arguments.
+current_stream = contextvars.ContextVar("upstream_stream", default=None)
+
+# provider -> (max concurrency, requests per second (0 = unlimited))
+DEFAULT_BUDGETS = {
+    "openai_whisper": (16, 0.0),
+    "openai_chat": (16, 0.0),
+    "behavioral_signals": (16, 0.0),
+}
+
+
+class UpstreamBusy(Exception):
+    # The caller's deadline passed before the scheduler could admit the request
+    pass
+
+
+class DeadlineExceeded(UpstreamBusy):
+    # The caller's deadline passed while the admitted request was still running
+    pass
+
+
+class ProviderScheduler:
+    # Admission control for one upstream provider, shared by every stream in the process.
+    # A request is admitted when a concurrency slot and a rate token are free and the
+    # provider is not backing off after a rate-limit response. Waiting requests are
+    # served round-robin across streams (one busy stream cannot starve the others) and,
+    # within a stream, newest first: the freshest window is the one the user is waiting on.
+    def __init__(self, name: str, max_concurrency: int, rate_per_s: float = 0.0, burst: float = None,
+                 backoff_base_s: float = 1.0, backoff_cap_s: float = 30.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rate_per_s = rate_per_s
+        self.burst = burst if burst is not None else max(1.0, rate_per_s)
+        self.backoff_base_s = backoff_base_s
+        self.backoff_cap_s = backoff_cap_s
+
+        self.in_flight = 0
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._backoff_s = 0.0
+        # stream -> heap of (-priority, seq, future); ordered for round-robin
+        self._queues = OrderedDict()
+        self._seq = itertools.count()
+        self._timer = None
+
+        # Counters
+        self.admitted = 0
+        self.rate_limited = 0
+        self.expired = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for heap in self._queues.values() for _, _, fut in heap if not fut.done())
+
+    def _refill(self, now: float):
+        if self.rate_per_s > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_per_s)
+        self._refilled = now
+
+    #Seconds until a request could be admitted (0 = now, None = waiting on a concurrency slot)
+    def _admission_delay(self, now: float):
+        if self.in_flight >= self.max_concurrency:
+            return None
+        if now < self._paused_until:
+            return self._paused_until - now
+        self._refill(now)
+        if self.rate_per_s > 0 and self._tokens < 1.0:
+            return (1.0 - self._tokens) / self.rate_per_s
+        return 0.0
+
+    def _admit(self):
+        self.in_flight += 1
+        if self.rate_per_s > 0:
+            self._tokens -= 1.0
+        self.admitted += 1
+
+    #Hand free capacity to waiting requests: next stream in rotation, its highest-priority waiter
+    def _dispatch(self):
+        self._timer = None
+        while self._queues:
+            delay = self._admission_delay(time.monotonic())
+            if delay is None:
+                return
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            stream, heap = self._queues.popitem(last=False)
+            _, _, fut = heapq.heappop(heap)
+            if heap:
+                self._queues[stream] = heap
+            if fut.done():
+                # Waiter gave up (cancelled or past its deadline)
+                continue
+            self._admit()
+            fut.set_result(None)
+
+    #Wait for admission. priority: higher is served first within a stream (default: arrival
+    #time, i.e. newest first). deadline: time.monotonic() after which UpstreamBusy is raised.
+    async def acquire(self, priority: float = None, deadline: float = None):
+        now = time.monotonic()
+        if not self._queues and self._admission_delay(now) == 0.0:
+            self._admit()
+            return
+        fut = asyncio.get_running_loop().create_future()
+        stream = current_stream.get()
+        heapq.heappush(self._queues.setdefault(stream, []),
+                       (-(now if priority is None else priority), next(self._seq), fut))
+        if self._timer is None:
+            self._dispatch()
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait({fut}, timeout=timeout)
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Admitted just as the caller was cancelled: hand the slot back
+                self.release()
+            fut.cancel()
+            raise
+        if not done:
+            fut.cancel()
+            self.expired += 1
+            raise UpstreamBusy(f"{self.name}: not admitted before deadline")
+        metrics.observe(f"{self.name}_queue_wait", time.monotonic() - now)
+
+    def release(self):
+        self.in_flight -= 1
+        if self._queues and self._timer is None:
+            self._dispatch()
+
+    #A 429 (or equivalent) from the provider: pause admissions for Retry-After, else exponential backoff
+    def report_rate_limited(self, retry_after_s: float = None):
+        self.rate_limited += 1
+        metrics.inc("resonate_upstream_rate_limited_total", provider=self.name)
+        self._backoff_s = min(self.backoff_cap_s, max(self.backoff_base_s, self._backoff_s * 2))
+        pause = retry_after_s if retry_after_s else random.uniform(0.5, 1.0) * self._backoff_s
+        self._paused_until = max(self._paused_until, time.monotonic() + pause)
+        logger.warning(f"{self.name} rate limited, pausing admissions for {pause:.2f}s")
+
+    def report_success(self):
+        self._backoff_s = 0.0
+
+    @asynccontextmanager
+    async def slot(self, priority: float = None, deadline: float = None):
+        await self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "expired": self.expired,
+            "paused_s": round(max(0.0, self._paused_until - time.monotonic()), 2),
+        }
+
+
+_schedulers = {}
+
+
+#Process-wide scheduler for a provider; budgets from UPSTREAM_<PROVIDER>_CONCURRENCY / _RATE / _BURST
+def get(provider: str) -> ProviderScheduler:
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        concurrency, rate = DEFAULT_BUDGETS.get(provider, (16, 0.0))
+        prefix = f"UPSTREAM_{provider.upper()}"
+        burst = os.getenv(f"{prefix}_BURST")
+        scheduler = _schedulers[provider] = ProviderScheduler(
+            provider,
+            max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+            rate_per_s=float(os.getenv(f"{prefix}_RATE", str(rate))),
+            burst=float(burst) if burst else None,
+        )
+    return scheduler
+
+
+def _scheduler_gauges():
+    gauges = []
+    for name, scheduler in _schedulers.items():
+        gauges.append(("resonate_upstream_in_flight", {"provider": name}, scheduler.in_flight))
+        gauges.append(("resonate_upstream_queued", {"provider": name}, scheduler.queued))
+    return gauges
+
+metrics.register_gauges(_scheduler_gauges, {
+    "resonate_upstream_in_flight": "Admitted upstream requests per provider",
+    "resonate_upstream_queued": "Upstream requests waiting for admission per provider",
+})
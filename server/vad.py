@@ -0,0 +1,181 @@
+import numpy as np
+
+
+class SpeechSegment:
+    __slots__ = ("start", "end", "speech_samples", "forced")
+
+    # start/end are absolute sample indexes in the stream; forced = cut at max length rather than at a pause
+    def __init__(self, start: int, end: int, speech_samples: int, forced: bool):
+        self.start = start
+        self.end = end
+        self.speech_samples = speech_samples
+        self.forced = forced
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return f"SpeechSegment(start={self.start}, end={self.end}, speech={self.speech_samples}, forced={self.forced})"
+
+
+class EnergyVAD:
+    # Frame classifier: log energy against an adaptive noise floor, with zero-crossing
+    # rate used to reject hiss-like frames that are only moderately above the floor.
+    def __init__(self, margin_db: float = 10.0, min_level_db: float = -50.0, noisy_zcr: float = 0.4,
+                 initial_floor_db: float = -60.0, calibration_frames: int = 15):
+        self.margin_db = margin_db
+        self.min_level_db = min_level_db
+        self.noisy_zcr = noisy_zcr
+        self.noise_floor_db = initial_floor_db
+        # Leading frames treated as background to seed the noise floor (~300ms at 20ms frames)
+        self.calibration_frames = calibration_frames
+
+        # Noise floor tracking rates: fast down, moderate on noise, very slow creep up during speech
+        self.floor_calibration_rate = 0.3
+        self.floor_down_rate = 0.2
+        self.floor_noise_rate = 0.05
+        self.floor_speech_rate = 0.001
+
+    #Classify a (n_frames, frame_len) block; returns a bool array (True = speech)
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        energy = np.einsum("ij,ij->i", frames, frames) / frames.shape[1]
+        level_db = 10.0 * np.log10(energy + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frames.shape[1] - 1)
+
+        decisions = np.empty(len(frames), dtype=bool)
+        # Sequential only for the floor update; usually a single frame per call
+        for i in range(len(frames)):
+            db = level_db[i]
+            floor = self.noise_floor_db
+            if self.calibration_frames > 0:
+                self.calibration_frames -= 1
+                decisions[i] = False
+                self.noise_floor_db = max(-90.0, floor + self.floor_calibration_rate * (db - floor))
+                continue
+
+            speech = db > max(floor + self.margin_db, self.min_level_db)
+            if speech and zcr[i] > self.noisy_zcr and db < floor + 2 * self.margin_db:
+                speech = False
+            decisions[i] = speech
+
+            if db < floor:
+                rate = self.floor_down_rate
+            elif speech:
+                rate = self.floor_speech_rate
+            else:
+                rate = self.floor_noise_rate
+            self.noise_floor_db = max(-90.0, floor + rate * (db - floor))
+        return decisions
+
+
+class SpeechSegmenter:
+    # Streaming utterance segmenter. Feed audio with push(); it returns finished
+    # SpeechSegments cut at natural pauses (or at max length) and tracks which
+    # samples the caller must keep buffered (keep_from).
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20, min_segment_s: float = 1.0,
+                 max_segment_s: float = 10.0, pause_s: float = 0.5, max_silence_s: float = 1.5,
+                 preroll_s: float = 0.2, overlap_s: float = 0.1, min_speech_s: float = 0.2, vad: EnergyVAD = None):
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_ms / 1000)
+        self.min_segment = int(min_segment_s * sample_rate)
+        self.max_segment = int(max_segment_s * sample_rate)
+        self.pause = int(pause_s * sample_rate)
+        self.max_silence = int(max_silence_s * sample_rate)
+        self.preroll = int(preroll_s * sample_rate)
+        self.overlap = int(overlap_s * sample_rate)
+        self.min_speech = int(min_speech_s * sample_rate)
+        self.vad = vad or EnergyVAD()
+
+        # Unclassified tail (< one frame) and absolute index of its first sample
+        self._pending = np.empty(0, dtype=np.float32)
+        self._pos = 0
+
+        # Open segment state (seg_start is None while idle)
+        self._seg_start = None
+        self._last_speech_end = 0
+        self._speech_samples = 0
+
+        # Counters
+        self.segments_emitted = 0
+        self.emitted_samples = 0
+        self.skipped_segments = 0
+        self.skipped_samples = 0
+
+    # Earliest absolute sample index still needed for a future segment
+    @property
+    def keep_from(self) -> int:
+        if self._seg_start is not None:
+            return self._seg_start
+        return max(0, self._pos - self.preroll)
+
+    @property
+    def in_speech(self) -> bool:
+        return self._seg_start is not None
+
+    #Classify newly buffered samples frame by frame and return any completed segments
+    def push(self, samples: np.ndarray) -> list:
+        if len(self._pending):
+            samples = np.concatenate((self._pending, samples))
+        n_frames = len(samples) // self.frame_len
+        used = n_frames * self.frame_len
+        self._pending = samples[used:].copy()
+        if n_frames == 0:
+            return []
+
+        decisions = self.vad.classify(samples[:used].reshape(n_frames, self.frame_len))
+        finished = []
+        for speech in decisions:
+            frame_start = self._pos
+            frame_end = frame_start + self.frame_len
+            self._pos = frame_end
+
+            if self._seg_start is None:
+                if not speech:
+                    continue
+                self._seg_start = max(0, frame_start - self.preroll)
+                self._speech_samples = 0
+
+            if speech:
+                self._last_speech_end = frame_end
+                self._speech_samples += self.frame_len
+
+            length = frame_end - self._seg_start
+            silence = frame_end - self._last_speech_end
+            if length >= self.max_segment:
+                self._close(frame_end, True, finished)
+                # Keep going mid-utterance with a small overlap for context
+                if speech:
+                    self._seg_start = frame_end - self.overlap
+                    self._speech_samples = 0
+            elif (silence >= self.pause and length >= self.min_segment) or silence >= self.max_silence:
+                self._close(frame_end, False, finished)
+        return finished
+
+    #Emit whatever is open (e.g. at stream end)
+    def flush(self) -> list:
+        finished = []
+        if self._seg_start is not None:
+            self._close(self._pos, False, finished)
+        return finished
+
+    def _close(self, end: int, forced: bool, finished: list):
+        segment = SpeechSegment(self._seg_start, end, self._speech_samples, forced)
+        self._seg_start = None
+        if segment.speech_samples >= self.min_speech:
+            self.segments_emitted += 1
+            self.emitted_samples += len(segment)
+            finished.append(segment)
+        else:
+            self.skipped_segments += 1
+            self.skipped_samples += len(segment)
+
+    def stats(self) -> dict:
+        total = max(1, self._pos)
+        return {
+            "segments": self.segments_emitted,
+            "emitted_s": round(self.emitted_samples / self.sample_rate, 2),
+            "skipped_segments": self.skipped_segments,
+            "stream_s": round(self._pos / self.sample_rate, 2),
+            "upload_ratio": round(self.emitted_samples / total, 3),
+        }
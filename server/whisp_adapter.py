@@ -1,41 +1,68 @@
-import numpy as np
 import logging
 import os
-from openai import OpenAI
 
 import audio_utils
+import metrics
+import openai_client
+import result_cache
+import upstream_scheduler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Process-wide transcript cache keyed by audio content + model (None when disabled)
+transcript_cache = result_cache.from_env("whisper")
+
 class Transcriber:
     def __init__(self, target_sample_rate=16000):
         self.target_sample_rate = target_sample_rate
         self.model_name = os.getenv("OPENAI_WHISPER_MODEL", "whisper-1")
-        self._client = None
-
-        if OpenAI is not None:
-            try:
-                self._client = OpenAI() 
-            except Exception as e:
-                logger.error(f"Failed to initialize OpenAI client: {e}")
+        # Process-wide AsyncOpenAI client (shared connection pool)
+        self._client = openai_client.get_client()
+        # Requests that failed (returned "" rather than a transcript); batch mode uses it to retry files
+        self.failed_requests = 0
 
-    def transcribe_chunk(self, audio_chunk: np.ndarray) -> str:
+    # audio_chunk: AudioSegment (preferred, encoded once) or float numpy array.
+    # deadline: time.monotonic() after which the transcript is no longer wanted ("" is returned)
+    async def transcribe_chunk(self, audio_chunk, deadline: float = None) -> str:
 
-        wav_buf = audio_utils.numpy_to_wav_bytes(audio_chunk)
-        wav_buf.name = 'audio.wav'
-        wav_buf.seek(0)
+        if self._client is None:
+            self.failed_requests += 1
+            return ""
+        segment = audio_utils.as_segment(audio_chunk, self.target_sample_rate)
+        cache_key = None
+        if transcript_cache is not None:
+            cache_key = transcript_cache.key(segment, model=self.model_name, rate=segment.sample_rate)
+            cached = await transcript_cache.lookup(cache_key)
+            if cached is not None:
+                return cached
+        # Raw bytes (not a file object) so a retried request can resend them; shared with the BS upload
+        wav_bytes = segment.wav_bytes()
 
         try:
             # Post Request
-            resp = self._client.audio.transcriptions.create(
-                model=self.model_name,
-                file=wav_buf,
-            )
+            with metrics.timer("whisper_request"):
+                resp = await openai_client.request(
+                    "openai_whisper",
+                    self._client.audio.transcriptions.create,
+                    model=self.model_name,
+                    file=("audio.wav", wav_bytes, "audio/wav"),
+                    deadline=deadline,
+                )
+            metrics.upstream("openai_whisper", True)
 
-            transcript = getattr(resp, 'text', None)
+            transcript = getattr(resp, 'text', None) or ""
+            # Only successful responses are cached (failures fall through to the except below)
+            if cache_key is not None:
+                await transcript_cache.store(cache_key, transcript)
             return transcript
-        
+
+        except upstream_scheduler.UpstreamBusy as e:
+            # Shed, not failed: the caller stopped waiting for this window
+            logger.info(f"Transcription abandoned: {e}")
+            return ""
         except Exception as e:
+            metrics.upstream("openai_whisper", False)
+            self.failed_requests += 1
             logger.error(f"OpenAI transcription failed: {e}")
             return ""
\ No newline at end of file
@@ -0,0 +1,186 @@
+import json
+import logging
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROTOCOL_LEGACY = "legacy"
+PROTOCOL_DELTA = "delta"
+DELTA_VERSION = 1
+
+# Compact JSON: no whitespace between tokens
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+class LegacyWire:
+    # Original outbound frames: full dicts, repeated Behavioral Signals metadata and the
+    # LLM payload on every transcript. Kept for clients that do not negotiate a protocol.
+    protocol = PROTOCOL_LEGACY
+    encoding = "json"
+
+    def hello(self):
+        return None
+
+    def transcript(self, stream_id, segment_seq, text, timestamp_ms, labels, bs_meta, llm_payload):
+        return json.dumps({
+            'stream_id': stream_id,
+            'timestamp': timestamp_ms,
+            'transcript': text,
+            'feedback': labels,
+            'behavioral_signals': bs_meta,
+            'text': text,
+            'llm': llm_payload,
+        })
+
+    def tone(self, segment_seq, window_seq, start_ms, end_ms, labels, bs_meta):
+        return json.dumps({
+            'type': 'bs_update',
+            'chunk': {
+                'start_ms': start_ms,
+                'end_ms': end_ms,
+                'seq': window_seq,
+                'segment_seq': segment_seq,
+            },
+            'feedback': labels,
+            'behavioral_signals': bs_meta,
+        })
+
+    def feedback(self, feedback_id, text, user_intent, timestamp_ms):
+        return json.dumps({
+            'type': 'ai_feedback',
+            'feedback': text,
+            'feedback_id': feedback_id,
+            'user_intent': user_intent,
+            'timestamp': timestamp_ms,
+        })
+
+    def feedback_delta(self, feedback_id, delta, timestamp_ms):
+        return json.dumps({
+            'type': 'ai_feedback_delta',
+            'feedback_id': feedback_id,
+            'delta': delta,
+            'timestamp': timestamp_ms,
+        })
+
+    def feedback_cancelled(self, feedback_id, timestamp_ms):
+        return json.dumps({
+            'type': 'ai_feedback_cancelled',
+            'feedback_id': feedback_id,
+            'timestamp': timestamp_ms,
+        })
+
+    def prosody(self, metrics, timestamp_ms):
+        return json.dumps({
+            'type': 'prosody_update',
+            'timestamp': timestamp_ms,
+            'prosody': metrics,
+        })
+
+    def status(self, degraded, shed, timestamp_ms):
+        return json.dumps({
+            'type': 'stream_status',
+            'degraded': degraded,
+            'shed': shed,
+            'timestamp': timestamp_ms,
+        })
+
+    def complete(self):
+        return json.dumps({
+            'type': 'stream_complete',
+            'message': 'Audio stream processing complete'
+        })
+
+
+class DeltaWire:
+    # Negotiated compact protocol. Each frame carries only what is new, so its size does
+    # not grow with the session:
+    #   hello  {"t":"hello","v":1,"enc":"json"}          reply to stream_start
+    #   tr     {"t":"tr","q":seq,"s":seg,"ts":ms,"x":text} new transcript segment
+    #   bs     {"t":"bs","q":seq,"s":seg,"w":window,"a":start_ms,"b":end_ms,"l":{changed labels}}
+    #   fd     {"t":"fd","q":seq,"i":feedback_id,"d":text delta}
+    #   fb     {"t":"fb","q":seq,"i":feedback_id,"ts":ms,"x":full feedback text}
+    #   fx     {"t":"fx","q":seq,"i":feedback_id}     feedback superseded
+    #   pr     {"t":"pr","q":seq,"ts":ms,"p":{changed prosody fields}}
+    #   st     {"t":"st","q":seq,"dg":0|1,"sh":{"stage:reason": count}}  degraded mode changed
+    #   end    {"t":"end","q":seq}                    stream_complete
+    # q increases by one per frame (gap = lost frame). Label and prosody deltas are applied
+    # to the client's running state; a key set to null was removed. Frames are text JSON,
+    # or binary MessagePack when negotiated and available on the server.
+    protocol = PROTOCOL_DELTA
+
+    def __init__(self, encoding: str = "json"):
+        self.encoding = encoding
+        self._seq = 0
+        self._labels = {}
+        self._prosody = {}
+
+    def _encode(self, frame: dict):
+        self._seq += 1
+        frame["q"] = self._seq
+        if self.encoding == "msgpack":
+            return msgpack.packb(frame, use_bin_type=True)
+        return _dumps(frame)
+
+    #Changed keys of `current` relative to `previous` (removed keys map to None); updates `previous`
+    @staticmethod
+    def _diff(previous: dict, current: dict) -> dict:
+        changed = {k: v for k, v in current.items() if previous.get(k, object()) != v}
+        for k in previous.keys() - current.keys():
+            changed[k] = None
+        previous.clear()
+        previous.update(current)
+        return changed
+
+    def hello(self):
+        self._seq += 1
+        # Always JSON, so a client can read it before switching decoders
+        return _dumps({"t": "hello", "v": DELTA_VERSION, "enc": self.encoding, "q": self._seq})
+
+    def transcript(self, stream_id, segment_seq, text, timestamp_ms, labels, bs_meta, llm_payload):
+        return self._encode({"t": "tr", "s": segment_seq, "ts": timestamp_ms, "x": text})
+
+    def tone(self, segment_seq, window_seq, start_ms, end_ms, labels, bs_meta):
+        frame = {"t": "bs", "s": segment_seq, "w": window_seq, "a": start_ms, "b": end_ms}
+        changed = self._diff(self._labels, labels)
+        if changed:
+            frame["l"] = changed
+        return self._encode(frame)
+
+    def feedback(self, feedback_id, text, user_intent, timestamp_ms):
+        return self._encode({"t": "fb", "i": feedback_id, "ts": timestamp_ms, "x": text})
+
+    def feedback_delta(self, feedback_id, delta, timestamp_ms):
+        return self._encode({"t": "fd", "i": feedback_id, "d": delta})
+
+    def feedback_cancelled(self, feedback_id, timestamp_ms):
+        return self._encode({"t": "fx", "i": feedback_id})
+
+    def prosody(self, metrics, timestamp_ms):
+        changed = self._diff(self._prosody, metrics)
+        if not changed:
+            return None
+        return self._encode({"t": "pr", "ts": timestamp_ms, "p": changed})
+
+    def status(self, degraded, shed, timestamp_ms):
+        return self._encode({"t": "st", "dg": int(bool(degraded)), "sh": shed})
+
+    def complete(self):
+        return self._encode({"t": "end"})
+
+
+#Wire for a stream_start payload: {"protocol": "delta", "wire_encoding": "json" | "msgpack"}; legacy otherwise
+def negotiate(payload: dict):
+    if payload.get('protocol') != PROTOCOL_DELTA:
+        return LegacyWire()
+    encoding = payload.get('wire_encoding', 'json')
+    if encoding == 'msgpack' and msgpack is None:
+        logger.info("msgpack requested but not installed, using JSON")
+        encoding = 'json'
+    elif encoding not in ('json', 'msgpack'):
+        encoding = 'json'
+    return DeltaWire(encoding)
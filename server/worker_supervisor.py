@@ -0,0 +1,148 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class WorkerSlots:
+    # Shared-memory health board: per slot, the owning worker pid, its last heartbeat
+    # and its active stream count. Only the current owner of a slot may write to it, so
+    # a draining predecessor cannot make its replacement look healthy.
+    def __init__(self, ctx, workers: int):
+        self.owners = ctx.Array("i", workers, lock=False)
+        self.heartbeats = ctx.Array("d", workers, lock=False)
+        self.active_streams = ctx.Array("i", workers, lock=False)
+
+    #Called periodically from inside a worker
+    def heartbeat(self, slot: int, active_streams: int):
+        if self.owners[slot] == os.getpid():
+            self.heartbeats[slot] = time.time()
+            self.active_streams[slot] = active_streams
+
+
+class Supervisor:
+    # Forks N worker processes that each bind the same port with SO_REUSEPORT (the
+    # kernel load-balances new connections across them). Workers report a heartbeat
+    # and their active stream count through shared memory; the supervisor replaces
+    # workers that exit or stop heartbeating (e.g. a blocked event loop).
+    #
+    # Signals: SIGHUP = rolling restart (old worker drains while its replacement
+    # serves), SIGTERM/SIGINT = drain every worker, then exit.
+    def __init__(self, target, workers: int, health_timeout_s: float = 10.0, drain_timeout_s: float = 30.0):
+        # target(slot, slots: WorkerSlots) runs inside each worker process
+        self.target = target
+        self.workers = workers
+        self.health_timeout_s = health_timeout_s
+        self.drain_timeout_s = drain_timeout_s
+
+        self._ctx = multiprocessing.get_context("fork")
+        self.slots = WorkerSlots(self._ctx, workers)
+        self._procs = [None] * workers
+        # (process, deadline) of workers that were asked to drain
+        self._draining = []
+        self._stopping = False
+        self._restart_requested = False
+
+    def _spawn(self, slot: int):
+        # A fresh worker gets a grace period before its first heartbeat is due
+        self.slots.heartbeats[slot] = time.time()
+        self.slots.active_streams[slot] = 0
+        proc = self._ctx.Process(
+            target=self.target,
+            args=(slot, self.slots),
+            name=f"ws-worker-{slot}",
+            daemon=False,
+        )
+        proc.start()
+        self.slots.owners[slot] = proc.pid
+        self._procs[slot] = proc
+        logger.info(f"Worker {slot} started (pid={proc.pid})")
+
+    #Ask a worker to stop accepting connections and finish its streams
+    def _drain(self, proc):
+        if proc is not None and proc.is_alive():
+            os.kill(proc.pid, signal.SIGTERM)
+            self._draining.append((proc, time.time() + self.drain_timeout_s + 5.0))
+
+    def _reap_draining(self):
+        still = []
+        for proc, deadline in self._draining:
+            if not proc.is_alive():
+                proc.join(0)
+                continue
+            if time.time() > deadline:
+                logger.warning(f"Worker pid={proc.pid} did not drain in time, killing")
+                proc.kill()
+                proc.join(1)
+                continue
+            still.append((proc, deadline))
+        self._draining = still
+
+    def _check_health(self):
+        now = time.time()
+        for slot, proc in enumerate(self._procs):
+            if proc is None or not proc.is_alive():
+                code = proc.exitcode if proc is not None else None
+                logger.warning(f"Worker {slot} exited (code={code}), restarting")
+                self._spawn(slot)
+            elif now - self.slots.heartbeats[slot] > self.health_timeout_s:
+                logger.warning(f"Worker {slot} (pid={proc.pid}) missed heartbeats, replacing")
+                self._drain(proc)
+                self._spawn(slot)
+
+    #Replace workers one at a time; each replacement must heartbeat before the next slot is cycled
+    def _rolling_restart(self):
+        logger.info("Rolling restart")
+        for slot in range(self.workers):
+            old = self._procs[slot]
+            self._spawn(slot)
+            started = self.slots.heartbeats[slot]
+            wait_until = time.time() + self.health_timeout_s
+            while self.slots.heartbeats[slot] == started and time.time() < wait_until and not self._stopping:
+                time.sleep(0.1)
+            self._drain(old)
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_restart(self, signum, frame):
+        self._restart_requested = True
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {"slot": i, "pid": p.pid if p else None, "alive": bool(p and p.is_alive()),
+                 "active_streams": self.slots.active_streams[i],
+                 "heartbeat_age_s": round(time.time() - self.slots.heartbeats[i], 1)}
+                for i, p in enumerate(self._procs)
+            ],
+            "draining": len(self._draining),
+        }
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_restart)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        while not self._stopping:
+            time.sleep(1.0)
+            if self._restart_requested:
+                self._restart_requested = False
+                self._rolling_restart()
+            self._check_health()
+            self._reap_draining()
+
+        logger.info("Shutting down workers")
+        for proc in self._procs:
+            self._drain(proc)
+        while self._draining:
+            time.sleep(0.2)
+            self._reap_draining()
+        logger.info("All workers stopped")
@@ -4,222 +4,689 @@ import numpy as np
 import logging
 import time
 import os
-from openai import OpenAI
+import uuid
+import weakref
+from collections import deque
 
 from whisp_adapter import Transcriber
-from bs_adapter import ToneAnalyzer
-from audio_utils import mulaw_to_linear
+from llm_context import ConversationContext, estimate_tokens
+import openai_client
+from bs_adapter import ToneAnalyzer, iter_final_labels
+from audio_utils import mulaw_to_float32, PolyphaseResampler, AudioSegment
+from audio_buffer import AudioRingBuffer
+from vad import SpeechSegmenter
+from prosody import ProsodyAnalyzer
+from load_shedding import LoadShedder
+import tone_timeline
+from tone_timeline import ToneTimeline
+import wire_protocol
+from stream_pipeline import StreamPipeline, DROP_OLDEST
 import past_speech_sessions
+import metrics
+import upstream_scheduler
+from past_speech_sessions import SpeechSegment
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Open streams in this process (weak: a processor leaves the set once it is gone)
+_live_processors = weakref.WeakSet()
+
+#Active stream count and per-queue depth/drops summed over live streams, computed at scrape time
+def _stream_gauges():
+    gauges = [("resonate_active_streams", {}, len(_live_processors))]
+    gauges.append(("resonate_degraded_streams", {}, sum(1 for p in list(_live_processors) if p.shedder.degraded)))
+    depth = {}
+    dropped = {}
+    for processor in list(_live_processors):
+        for name, queue in processor.pipeline_stats().items():
+            depth[name] = depth.get(name, 0) + queue["depth"]
+            dropped[name] = dropped.get(name, 0) + queue["dropped"]
+    gauges += [("resonate_queue_depth", {"queue": name}, value) for name, value in depth.items()]
+    gauges += [("resonate_queue_dropped", {"queue": name}, value) for name, value in dropped.items()]
+    return gauges
+
+metrics.register_gauges(_stream_gauges, {
+    "resonate_active_streams": "Open WebSocket streams",
+    "resonate_degraded_streams": "Open streams in degraded (load shedding) mode",
+    "resonate_shed_total": "Work dropped instead of being delivered late, by stage and reason",
+    "resonate_queue_depth": "Items waiting per pipeline queue (all open streams)",
+    "resonate_queue_dropped": "Items dropped per pipeline queue by open streams",
+})
+
 class WebSocketProcessor:
     def __init__(self, websocket, transcriber: Transcriber, tone_analyzer: ToneAnalyzer):
         self.websocket = websocket
         self.transcriber = transcriber
         self.tone_analyzer = tone_analyzer
+        # Segments still waiting on transcript / tone / feedback, by sequence number (oldest evicted first).
+        # Completed history lives in the durable segment log, not here.
         self.segments = {}
         self.segmentCount = 0
+        self.max_open_segments = 16
 
 
         self.stream_id = None
-        self.audio_buffer = []
-        # Processing chunk size for Whisper input
-        self.min_chunk_samples = 160000  # 10.0 seconds at 16kHz
+        self.session_id = None
         self.sample_rate = 16000
+        # VAD segmentation: utterances are cut at pauses, between min and max length.
+        # All-silence stretches are never uploaded to Whisper or Behavioral Signals.
+        self.min_segment_s = 1.0
+        self.max_segment_s = 10.0
+        self.pause_s = 0.5
+        # Overlap retained when a long utterance is force-cut at max length
+        self.overlap_s = 0.1
+        self.segmenter = SpeechSegmenter(
+            sample_rate=self.sample_rate,
+            min_segment_s=self.min_segment_s,
+            max_segment_s=self.max_segment_s,
+            pause_s=self.pause_s,
+            overlap_s=self.overlap_s,
+        )
+        # Bounded per-stream audio buffer (float32): one max-length segment plus 2s of headroom
+        self.max_buffer_samples = int(self.max_segment_s * self.sample_rate) + 2 * self.sample_rate
+        self.audio_buffer = AudioRingBuffer(self.max_buffer_samples)
+        # Client capture rate (negotiated in stream_start); audio is resampled to self.sample_rate
+        self.input_sample_rate = self.sample_rate
+        self.resampler = PolyphaseResampler(self.input_sample_rate, self.sample_rate)
+        # Reusable mulaw decode output, grown on demand
+        self._decode_buf = np.empty(0, dtype=np.float32)
+        # Local prosody (pitch, loudness, pace, pauses) over the last 3s, ~4 prosody_update frames/s.
+        # Fills the gaps between Behavioral Signals results, which take seconds to arrive.
+        self.prosody = ProsodyAnalyzer(sample_rate=self.sample_rate)
+        self.prosody_updates = os.getenv("PROSODY_UPDATES", "1") == "1"
+        self._prosody_silent = False
+        # Outbound frame encoder; clients opt into the compact delta protocol in stream_start
+        self.wire = wire_protocol.LegacyWire()
 
         #User Speech Selections
         self.user_intent = None
         self.user_purpose = None
         self.user_audience = None
 
-        # Conversation accumulators
+        # Conversation accumulators (bounded: the transcript keeps its newest characters)
+        self.max_transcript_chars = 4000
         self.total_transcript = ""
-        self.gpt_responses = []
+        self.gpt_responses = deque(maxlen=20)
+        # Bounded GPT context: recent segments + rolling summary within a token budget
+        self.llm_context = ConversationContext(summarizer=self.summarize_context)
+        self.last_prompt_tokens = None
+        self.feedback_model = os.getenv("OPENAI_GPT4_TURBO_MODEL", "gpt-4o-mini")
+        # Streamed feedback (ai_feedback_delta frames); clients opt in via stream_start
+        self.stream_feedback = os.getenv("FEEDBACK_STREAMING", "0") == "1"
+        self.feedback_seq = 0
+        self.feedback_task = None
+        # Drain-and-confirm task started by stream_end (see complete_stream)
+        self.complete_task = None
+        # Set once the stream completed and its saved state was deleted
+        self.state_closed = False
+        # Saves run in order, one at a time, so an older snapshot never lands after a newer one
+        self.state_lock = asyncio.Lock()
+
+        # Per-stream pipeline: ingest -> decode/buffer -> transcribe -> feedback.
+        # The receive loop only enqueues frames, so a slow upstream call never stalls ingest.
+        # Ingest holds ~10s of 20ms frames; segments and feedback requests are latest-wins.
+        self.ingest_queue_size = 500
+        self.transcribe_queue_size = 2
+        self.feedback_queue_size = 1
+        self.stream_drain_timeout_s = 30.0
+
+        # Freshness budgets, from the end of an utterance: work that cannot finish within its
+        # budget is dropped (and counted) rather than delivered late as real-time results
+        self.transcript_deadline_s = float(os.getenv("TRANSCRIPT_DEADLINE_S", "8"))
+        self.feedback_deadline_s = float(os.getenv("FEEDBACK_DEADLINE_S", "10"))
+        # Degraded mode, entered when work keeps running close to or past its budget: one tone
+        # window per utterance with no backlog, and at most one GPT request per interval
+        self.shedder = LoadShedder()
+        self.degraded_feedback_interval_s = 6.0
+        self._last_feedback_started = None
+
+        # Tone analysis: every utterance is cut into BS windows (window/hop below, the last one
+        # aligned to the utterance end), analyzed several at a time and committed to the
+        # timeline in window order. Windows beyond the backlog, or not admitted before the
+        # staleness limit, are skipped (oldest first) rather than analyzed late.
+        self.tone_window_s = float(os.getenv("TONE_WINDOW_S", "6"))
+        self.tone_hop_s = float(os.getenv("TONE_HOP_S", str(self.tone_window_s)))
+        self.tone_max_in_flight = int(os.getenv("TONE_MAX_IN_FLIGHT", "3"))
+        self.tone_max_backlog = 8
+        self.bs_stale_after_s = float(os.getenv("TONE_DEADLINE_S", "20"))
+        self.tone_slots = asyncio.Semaphore(self.tone_max_in_flight)
+        self.tone_timeline = ToneTimeline()
+        # (window, task) per window not yet resolved, oldest first
+        self.bs_tasks = deque()
+        self.pipeline = StreamPipeline(name="ws_processor")
+        self.ingest_queue = self.pipeline.add_stage("decode", self.process_audio_bytes, self.ingest_queue_size, DROP_OLDEST)
+        self.transcribe_queue = self.pipeline.add_stage("transcribe", self.process_transcription_window, self.transcribe_queue_size, DROP_OLDEST)
+        self.feedback_queue = self.pipeline.add_stage("feedback", self.handle_gpt_feedback, self.feedback_queue_size, DROP_OLDEST)
+        # Committed tone windows waiting to be sent (in timeline order)
+        self.tone_queue = self.pipeline.add_stage("tone", self.send_tone_window, 64, DROP_OLDEST)
+
+    #Start pipeline workers (requires a running event loop)
+    def start(self):
+        # Upstream calls from this stream's tasks (created below and later) share one fair-queuing key
+        upstream_scheduler.current_stream.set(id(self))
+        self.pipeline.start()
+        _live_processors.add(self)
+
+    #Stop pipeline workers and log final queue stats
+    async def close(self):
+        _live_processors.discard(self)
+        # The client is gone: nothing left to confirm
+        if self.complete_task is not None and not self.complete_task.done():
+            self.complete_task.cancel()
+            await asyncio.wait({self.complete_task})
+        await self.pipeline.close()
+        self.cancel_feedback()
+        for _, task in self.bs_tasks:
+            task.cancel()
+        self.bs_tasks.clear()
+        logger.info(f"Stream {self.stream_id or 'unknown'} pipeline stats: {self.pipeline.stats()} "
+                    f"segmentation: {self.segmenter.stats()} tone: {self.tone_timeline.stats()} "
+                    f"shedding: {self.shedder.stats()}")
+
+    #Send one encoded frame (text or binary) to the client; None means there was nothing new to send
+    async def send_frame(self, frame):
+        if frame is None:
+            return
+        # Text frames go out as UTF-8; count bytes, not characters
+        size = len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame)
+        metrics.inc("resonate_ws_sent_bytes_total", size, protocol=self.wire.protocol)
+        with metrics.timer("ws_send"):
+            await self.websocket.send(frame)
+
+    #Behavioral Signals request metadata (legacy frames only)
+    def bs_meta(self) -> dict:
+        return {
+            'client_id': self.tone_analyzer.client_id,
+            'endpoint': self.tone_analyzer.endpoint,
+            'status_code': self.tone_analyzer.last_status_code,
+            'duration_ms': self.tone_analyzer.last_duration_ms,
+            'raw': self.tone_analyzer.last_raw_response,
+        }
 
-        # Behavioral Signals: trigger after 6s for each 10s window
-        self.bs_analysis_window = int(6.0 * self.sample_rate)
-        self.bs_started_for_current_window = False
+    #Queue depths / drop counters for each pipeline stage
+    def pipeline_stats(self) -> dict:
+        return self.pipeline.stats()
+
+    #Count shed work; tells the client when it switches the stream into or out of degraded mode
+    def shed(self, stage: str, reason: str, pressure: bool = True):
+        if self.shedder.shed(stage, reason, pressure):
+            asyncio.create_task(self.send_status())
+
+    #Record how much of its freshness budget a completed piece of work used
+    def observe_freshness(self, stage: str, started: float, budget_s: float):
+        if self.shedder.observe(stage, time.monotonic() - started, budget_s):
+            asyncio.create_task(self.send_status())
+
+    async def send_status(self):
+        try:
+            await self.send_frame(self.wire.status(self.shedder.degraded, dict(self.shedder.shed_counts), int(time.time() * 1000)))
+        except Exception as e:
+            logger.warning(f"Failed to send stream_status: {e}")
 
     #Async call to gpt-4-turbo 
     # TODO: Refactor this section (handle_gpt_feedback & request_gpt_feedback) into own class.
-    async def handle_gpt_feedback(self, llm_payload: dict):
+    async def handle_gpt_feedback(self, item):
+        seq, span, llm_payload, dispatched_at = item
+        deadline = dispatched_at + self.feedback_deadline_s
 
-        feedback = await asyncio.to_thread(self.request_gpt_feedback, llm_payload)
+        if self.shedder.degraded and self._last_feedback_started is not None:
+            # Degraded: at most one request per interval; a segment arriving meanwhile replaces this one
+            wait = self._last_feedback_started + self.degraded_feedback_interval_s - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(min(wait, max(0.0, deadline - time.monotonic())))
+                if self.feedback_queue.depth:
+                    self.shed('feedback', 'coalesced', pressure=False)
+                    return
+        if time.monotonic() >= deadline:
+            self.shed('feedback', 'expired')
+            return
+        self._last_feedback_started = time.monotonic()
+
+        self.feedback_seq += 1
+        feedback_id = self.feedback_seq
+        if self.stream_feedback:
+            request = self.stream_gpt_feedback(llm_payload, feedback_id)
+        else:
+            request = self.request_gpt_feedback(llm_payload)
+
+        # Run as a child task so a newer segment can cancel it (see cancel_feedback),
+        # and so it can be abandoned at the deadline
+        self.feedback_task = asyncio.create_task(request)
+        expired = False
+        try:
+            done, _ = await asyncio.wait({self.feedback_task}, timeout=max(0.0, deadline - time.monotonic()))
+            if not done:
+                expired = True
+                self.feedback_task.cancel()
+                await asyncio.wait({self.feedback_task})
+        finally:
+            if not self.feedback_task.done():
+                self.feedback_task.cancel()
+        if self.feedback_task.cancelled():
+            if expired:
+                logger.info(f"GPT feedback {feedback_id} missed its {self.feedback_deadline_s}s deadline")
+                self.shed('feedback', 'deadline')
+            else:
+                logger.info(f"GPT feedback {feedback_id} superseded by a newer segment")
+                self.shed('feedback', 'superseded', pressure=False)
+            if self.stream_feedback:
+                await self.send_frame(self.wire.feedback_cancelled(feedback_id, int(time.time() * 1000)))
+            return
+        feedback = self.feedback_task.result()
+        if feedback is None:
+            # Failed stream: its partial text is neither final feedback nor conversation history
+            return
+        self.observe_freshness('feedback', dispatched_at, self.feedback_deadline_s)
             
         if isinstance(feedback, str) and feedback.strip():
             # Store in response history
             self.gpt_responses.append(feedback.strip())
+            self.llm_context.add_feedback(feedback)
+            self.record_segment(seq, span, 'feedback', text=feedback.strip())
+
+        await self.send_frame(self.wire.feedback(feedback_id, feedback, llm_payload.get('user_intent'), int(time.time() * 1000)))
+
+        # Fold older segments into the summary off the feedback path
+        asyncio.create_task(self.llm_context.maybe_summarize())
+        await self.save_state()
 
-        await self.websocket.send(json.dumps({
-            'type': 'ai_feedback',
-            'feedback': feedback,
-            'user_intent': llm_payload.get('user_intent'),
-            'timestamp': int(time.time() * 1000),
-        }))
+    #Cancel an in-flight GPT request/stream made obsolete by a newer segment
+    def cancel_feedback(self):
+        if self.feedback_task is not None and not self.feedback_task.done():
+            self.feedback_task.cancel()
 
-    def request_gpt_feedback(self, llm_payload: dict) -> str:
+    def build_feedback_messages(self, llm_payload: dict) -> list:
+        # Build prompt per requirements
+        user_selected_tone = llm_payload.get('user_intent')
+        # Each field appears in the prompt exactly once
+        current_segment = {
+            'transcription': llm_payload.get('transcription'),
+            'voice_analysis': llm_payload.get('voice_analysis'),
+            'prosody': llm_payload.get('prosody'),
+        }
         
-        if OpenAI is None:
-            return ""
-        try:
-            client = OpenAI()
-        except Exception as e:
-            logger.warning(f"OpenAI client init failed: {e}")
+        # Derive fields expected by the prompt
+        user_purpose = llm_payload.get('user_purpose') or (self.user_purpose or '')
+        user_audience = llm_payload.get('audience_type')
+        context = llm_payload.get('context') or {}
+
+        #GPT PROMPT
+        prompt = (
+            "You are an AI speech coach providing **real-time emotional and behavioral feedback**. "
+            "Analyze the user's **most recent spoken segment** and behavioral metrics to understand their overall **emotional state, focus, and delivery approach**, rather than individual word choices. "
+            "Consider how their tone, pacing, and energy align with their intended tone, purpose, and audience. "
+            "Use the **conversation summary, recent segments** and your previous feedback for continuity, but base your response **only on what was just said**. "
+            "If the user has incorporated previous advice or shows signs of improvement, **reinforce that progress with clear, affirming feedback** that strengthens confidence and self-trust. "
+            "If emotional cues suggest hesitation, tension, or low confidence, provide **emotionally supportive and grounding feedback** that helps the user re-center — for example, gentle cues like taking a breath, pausing, or slowing down. "
+            "If the user appears to be drifting away from their intended purpose, tone, or audience focus, offer a **polite, nonjudgmental reminder** to help them realign with their goal — for instance, suggesting they refocus or reconnect with their main message. "
+            "Avoid harsh correction or technical critique. "
+            "Keep feedback concise, compassionate, and immediately grounding, focusing on maintaining emotional steadiness and conversational alignment.\n\n"
+            "User-selected tone: {user_selected_tone}\n"
+            "User purpose: {user_purpose}\n"
+            "Audience: {user_audience}\n"
+            "Current segment data: {current_segment}\n"
+            "Previous GPT feedback: {previous_feedback}\n"
+            "Conversation summary: {summary}\n"
+            "Recent segments: {recent_segments}"
+        ).format(
+            user_selected_tone=user_selected_tone,
+            user_purpose=user_purpose,
+            user_audience=user_audience,
+            current_segment=json.dumps(current_segment, ensure_ascii=False),
+            previous_feedback=json.dumps(context.get('previous_feedback', []), ensure_ascii=False),
+            summary=json.dumps(context.get('summary', ''), ensure_ascii=False),
+            recent_segments=json.dumps(context.get('recent_segments', []), ensure_ascii=False)
+        )
+
+        return [
+            {"role": "system", "content": "You are an AI speech coach."},
+            {"role": "user", "content": f"{prompt}\n\nKeep feedback no more than 5 words."},
+        ]
+
+    #Record prompt size per request (provider count when reported, else our estimate)
+    def record_prompt_tokens(self, usage, messages: list):
+        self.last_prompt_tokens = getattr(usage, 'prompt_tokens', None) or estimate_tokens(messages[-1]["content"])
+        logger.info(f"GPT feedback prompt_tokens={self.last_prompt_tokens}")
+
+    async def request_gpt_feedback(self, llm_payload: dict) -> str:
+        
+        # Process-wide AsyncOpenAI client (shared connection pool)
+        client = openai_client.get_client()
+        if client is None:
             return ""
 
         try:
-            # Build prompt per requirements
-            user_selected_tone = llm_payload.get('user_intent')
-            combined_json = llm_payload
-            
-            # Derive fields expected by the prompt
-            user_purpose = llm_payload.get('user_purpose') or (self.user_purpose or '')
-            user_audience = llm_payload.get('audience_type')
-            previous_feedback = llm_payload.get('gpt_responses')
-            full_transcript = llm_payload.get('total_transcript') or (self.total_transcript or '')
-
-            #GPT PROMPT
-            prompt = (
-                "You are an AI speech coach providing **real-time emotional and behavioral feedback**. "
-                "Analyze the user's **most recent spoken segment** and behavioral metrics to understand their overall **emotional state, focus, and delivery approach**, rather than individual word choices. "
-                "Consider how their tone, pacing, and energy align with their intended tone, purpose, and audience. "
-                "Use the **total transcript so far** and your previous feedback for continuity, but base your response **only on what was just said**. "
-                "If the user has incorporated previous advice or shows signs of improvement, **reinforce that progress with clear, affirming feedback** that strengthens confidence and self-trust. "
-                "If emotional cues suggest hesitation, tension, or low confidence, provide **emotionally supportive and grounding feedback** that helps the user re-center — for example, gentle cues like taking a breath, pausing, or slowing down. "
-                "If the user appears to be drifting away from their intended purpose, tone, or audience focus, offer a **polite, nonjudgmental reminder** to help them realign with their goal — for instance, suggesting they refocus or reconnect with their main message. "
-                "Avoid harsh correction or technical critique. "
-                "Keep feedback concise, compassionate, and immediately grounding, focusing on maintaining emotional steadiness and conversational alignment.\n\n"
-                "User-selected tone: {user_selected_tone}\n"
-                "User purpose: {user_purpose}\n"
-                "Audience: {user_audience}\n"
-                "Current segment data: {combined_json}\n"
-                "Previous GPT feedback: {previous_feedback}\n"
-                "Total transcript so far: {full_transcript}"
-            ).format(
-                user_selected_tone=user_selected_tone,
-                user_purpose=user_purpose,
-                user_audience=user_audience,
-                combined_json=json.dumps(combined_json, ensure_ascii=False),
-                previous_feedback=json.dumps(previous_feedback, ensure_ascii=False),
-                full_transcript=json.dumps(full_transcript, ensure_ascii=False)
-            )
+            messages = self.build_feedback_messages(llm_payload)
 
             #Send prompt to gpt-4-turbo, recieve response in resp
-            resp = client.chat.completions.create(
-                model=os.getenv("OPENAI_GPT4_TURBO_MODEL", "gpt-4o-mini"),
-                messages=[
-                    {"role": "system", "content": "You are an AI speech coach."},
-                    {"role": "user", "content": f"{prompt}\n\nKeep feedback no more than 5 words."},
-                ],
-                temperature=0.2,
-                max_tokens=16,
-            )
-            
+            with metrics.timer("gpt_request"):
+                resp = await openai_client.request(
+                    "openai_chat",
+                    client.chat.completions.create,
+                    model=self.feedback_model,
+                    messages=messages,
+                    temperature=0.2,
+                    max_tokens=16,
+                )
+            metrics.upstream("openai_chat", True)
+            self.record_prompt_tokens(getattr(resp, 'usage', None), messages)
+
             text = resp.choices[0].message.content
             return text
             
         except Exception as e:
+            metrics.upstream("openai_chat", False)
             logger.warning(f"OpenAI feedback request failed: {e}")
             return ""
 
-    #Process raw mulaw bytes (binary WebSocket frame)
-    async def process_audio_bytes(self, mulaw_bytes):
+    #Streamed variant: forwards tokens as ai_feedback_delta frames, returns the full text.
+    #A stream that fails part way returns None after telling the client to drop its draft
+    async def stream_gpt_feedback(self, llm_payload: dict, feedback_id: int) -> str:
+
+        client = openai_client.get_client()
+        if client is None:
+            return ""
+
+        parts = []
+        started = time.perf_counter()
         try:
-            # Convert mulaw to linear PCM
-            pcm_data = mulaw_to_linear(mulaw_bytes)
-            # Convert to float32 and normalize
-            audio_float = pcm_data.astype(np.float32) / 32768.0
-            # Buffer
-            self.audio_buffer.extend(audio_float)
-            
-            # Schedule BS as soon as we have the trigger window in the current buffer
-            if not self.bs_started_for_current_window and len(self.audio_buffer) >= self.bs_analysis_window:
-                bs_chunk = np.array(self.audio_buffer[:self.bs_analysis_window])
-
-                end_ts_ms = int(time.time() * 1000)
-                bs_window_ms = int((self.bs_analysis_window / float(self.sample_rate)) * 1000)
-                start_ts_ms = max(0, end_ts_ms - bs_window_ms)
-                
-                asyncio.create_task(self.process_bs_chunk(bs_chunk, start_ts_ms, end_ts_ms))
-                self.bs_started_for_current_window = True
-                logger.info(f"BS chunk scheduled (binary): start={start_ts_ms} end={end_ts_ms} samples={len(bs_chunk)}")
-            
-            # Process when enough samples are collected
-            if len(self.audio_buffer) >= self.min_chunk_samples:
-
-                #Sliding Window used to retain a small portion of previous audio chunk to preserve context
-                audio_chunk = np.array(self.audio_buffer[:self.min_chunk_samples])
-                overlap_samples = int(0.1 * self.sample_rate)
-                self.audio_buffer = self.audio_buffer[self.min_chunk_samples - overlap_samples:]
-                # Reset BS flag for the next 10s window
-                self.bs_started_for_current_window = False
-                # Transcribe (10s window)
-                text = await asyncio.to_thread(self.transcriber.transcribe_chunk, audio_chunk)
-
-                if text.strip():
-                    logger.info(f"Transcription: {text}")
-                    # Accumulate total transcript
-                    cleaned = str(text).strip()
-                    if cleaned:
-                        self.total_transcript += " " + cleaned
-                    llm_obj = self.assemble_llm_input(text)
-                    asyncio.create_task(self.handle_gpt_feedback(llm_obj))
-                    return {
-                        'stream_id': self.stream_id or 'unknown',
-                        'timestamp': int(time.time() * 1000),
-                        'transcript': text,
-                        'feedback': dict(self.tone_analyzer.last_feedback or {}),
-                        'behavioral_signals': {
-                            'client_id': self.tone_analyzer.client_id,
-                            'endpoint': self.tone_analyzer.endpoint,
-                            'status_code': self.tone_analyzer.last_status_code,
-                            'duration_ms': self.tone_analyzer.last_duration_ms,
-                            'raw': self.tone_analyzer.last_raw_response,
-                        },
-                        'text': text,
-                        'llm': llm_obj,
-                    }
+            messages = self.build_feedback_messages(llm_payload)
+            usage = None
+            async with openai_client.stream(
+                "openai_chat",
+                client.chat.completions.create,
+                model=self.feedback_model,
+                messages=messages,
+                temperature=0.2,
+                max_tokens=16,
+                stream_options={"include_usage": True},
+            ) as stream:
+                async for chunk in stream:
+                    usage = getattr(chunk, 'usage', None) or usage
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    if not parts:
+                        metrics.observe("gpt_first_token", time.perf_counter() - started)
+                    parts.append(delta)
+                    await self.send_frame(self.wire.feedback_delta(feedback_id, delta, int(time.time() * 1000)))
+            self.record_prompt_tokens(usage, messages)
+            metrics.observe("gpt_stream", time.perf_counter() - started)
+            metrics.upstream("openai_chat", True)
 
+        except Exception as e:
+            metrics.upstream("openai_chat", False)
+            logger.warning(f"OpenAI feedback stream failed after {len(parts)} chunk(s): {e}")
+            await self.send_frame(self.wire.feedback_cancelled(feedback_id, int(time.time() * 1000)))
+            return None
+        return "".join(parts)
 
+    #Condense evicted transcript text into the running conversation summary
+    async def summarize_context(self, summary: str, evicted_text: str) -> str:
+        client = openai_client.get_client()
+        if client is None:
+            return ""
+        # Lowest priority: live feedback for this stream goes first
+        resp = await openai_client.request(
+            "openai_chat",
+            client.chat.completions.create,
+            priority=0.0,
+            model=self.feedback_model,
+            messages=[
+                {"role": "system", "content": "You maintain a compact running summary of a speaker's session for a speech coach."},
+                {"role": "user", "content": (
+                    f"Current summary: {summary or '(none)'}\n"
+                    f"New transcript: {evicted_text}\n\n"
+                    f"Update the summary in at most {self.llm_context.summary_tokens // 2} words. "
+                    "Keep the speaker's main message, purpose and any recurring delivery issues."
+                )},
+            ],
+            temperature=0.2,
+            max_tokens=self.llm_context.summary_tokens,
+        )
+        return resp.choices[0].message.content
 
+    #Decode/buffer stage: process raw mulaw bytes (binary WebSocket frame); None flushes the open utterance
+    async def process_audio_bytes(self, mulaw_bytes):
+        try:
+            if mulaw_bytes is None:
+                for segment in self.segmenter.flush():
+                    self.dispatch_segment(segment)
+                return
+            with metrics.timer("decode"):
+                # Decode mulaw straight to normalized float32
+                n = len(mulaw_bytes)
+                if len(self._decode_buf) < n:
+                    self._decode_buf = np.empty(n, dtype=np.float32)
+                audio_float = mulaw_to_float32(mulaw_bytes, out=self._decode_buf[:n])
+                # Resample to the processing rate (no-op when the client already sends 16kHz)
+                audio_float = self.resampler.process(audio_float)
+            # At most 1s at a time, so the buffer (max segment + 2s) always still holds the open
+            # segment when it is cut, even from one large frame
+            for i in range(0, len(audio_float), self.sample_rate):
+                piece = audio_float[i:i + self.sample_rate]
+                # Buffer
+                with metrics.timer("buffer"):
+                    self.audio_buffer.write(piece)
 
-            return None
+                # Cut utterances at natural pauses and drop audio no future segment needs
+                with metrics.timer("vad"):
+                    segments = self.segmenter.push(piece)
+                for segment in segments:
+                    self.dispatch_segment(segment)
+                self.audio_buffer.discard_until(self.segmenter.keep_from)
+
+            with metrics.timer("prosody"):
+                update = self.prosody.push(audio_float)
+            if update is not None:
+                await self.send_prosody(update)
         except Exception as e:
             logger.error(f"Error processing binary audio: {e}")
-            return None
+
+    #Push the latest prosody metrics to the client; repeated all-silence updates are skipped
+    async def send_prosody(self, update: dict):
+        silent = update.get('energy_db') is None
+        if not self.prosody_updates or (silent and self._prosody_silent):
+            return
+        self._prosody_silent = silent
+        await self.send_frame(self.wire.prosody(update, int(time.time() * 1000)))
+
+    #Hand one utterance to both Whisper (transcribe stage) and Behavioral Signals
+    def dispatch_segment(self, segment):
+        # Freshness budgets start now, at the end of the utterance
+        dispatched_at = time.monotonic()
+        offset = segment.start - self.audio_buffer.start_index
+        length = len(segment)
+        if offset < 0:
+            # The ring buffer already dropped the start of the segment: keep what is left
+            logger.warning(f"Segment lost its first {-offset} samples (no longer buffered)")
+            length += offset
+            offset = 0
+            if length <= 0:
+                return
+        if self.shedder.poll():
+            asyncio.create_task(self.send_status())
+        self.segmentCount += 1
+        seq = self.segmentCount
+        # Encode once: int16 PCM (and its WAV bytes) shared by the Whisper and BS uploads.
+        # This is also the copy out of the ring buffer, which keeps receiving frames.
+        with metrics.timer("windowing"):
+            audio_chunk = AudioSegment.from_float(self.audio_buffer.window(length, offset), self.sample_rate)
+
+        # Wall-clock span of the segment, derived from how far the buffer has advanced past it
+        now_ms = int(time.time() * 1000)
+        end_ts_ms = now_ms - int((self.audio_buffer.end_index - segment.end) * 1000 / self.sample_rate)
+        start_ts_ms = max(0, end_ts_ms - int(length * 1000 / self.sample_rate))
+
+        self.segments[seq] = SpeechSegment(None, None, seq, start_ts_ms, end_ts_ms)
+        # Carried with the segment's work items, so results are logged with it even once it is evicted
+        span = (start_ts_ms, end_ts_ms)
+        while len(self.segments) > self.max_open_segments:
+            del self.segments[next(iter(self.segments))]
+
+        self.schedule_tone_windows(seq, span, audio_chunk, dispatched_at)
+        logger.info(f"Segment dispatched: seq={seq} start={start_ts_ms} end={end_ts_ms} samples={length} forced={segment.forced}")
+
+        # Oldest segment dropped if the transcribe stage falls behind
+        dropped = self.transcribe_queue.dropped
+        self.transcribe_queue.put_nowait((seq, span, audio_chunk, dispatched_at))
+        if self.transcribe_queue.dropped > dropped:
+            self.shed('transcribe', 'coalesced')
+
+    #Cut one utterance into tone windows and start their analyses; over the backlog, the
+    #oldest windows still waiting for a slot are skipped. Degraded: only the utterance's
+    #last window, and no backlog (newest wins)
+    def schedule_tone_windows(self, seq: int, span: tuple, audio_chunk: AudioSegment, dispatched_at: float):
+        start_ts_ms = span[0]
+        window = int(self.tone_window_s * self.sample_rate)
+        hop = max(1, int(self.tone_hop_s * self.sample_rate))
+        deadline = dispatched_at + self.bs_stale_after_s
+        offsets = tone_timeline.window_offsets(len(audio_chunk), window, hop)
+        degraded = self.shedder.degraded
+        if degraded and len(offsets) > 1:
+            for _ in offsets[:-1]:
+                self.shed('tone', 'degraded', pressure=False)
+            offsets = offsets[-1:]
+        for start, end in offsets:
+            tone_window = self.tone_timeline.open(
+                seq,
+                start_ts_ms + start * 1000 // self.sample_rate,
+                start_ts_ms + end * 1000 // self.sample_rate,
+                span,
+            )
+            task = asyncio.create_task(self.process_tone_window(tone_window, audio_chunk.window(start, end), deadline))
+            self.bs_tasks.append((tone_window, task))
+
+        active = [tone_window for tone_window, task in self.bs_tasks if not task.done()]
+        unstarted = sum(1 for tone_window in active if not tone_window.started)
+        # Windows that will not get a slot now
+        waiting = unstarted - max(0, self.tone_max_in_flight - (len(active) - unstarted))
+        # Beyond the normal backlog is overload; the rest of a degraded stream's backlog is policy,
+        # and spares the newest window
+        over_backlog = waiting - self.tone_max_backlog
+        excess = min(waiting, unstarted - 1) if degraded else over_backlog
+        kept = deque()
+        for tone_window, task in self.bs_tasks:
+            if task.done():
+                continue
+            if excess > 0 and not tone_window.started:
+                # Resolved here: a task cancelled before its first step never runs its finally
+                task.cancel()
+                self.resolve_tone_window(tone_window, tone_timeline.SKIPPED)
+                excess -= 1
+                if over_backlog > 0:
+                    over_backlog -= 1
+                    self.shed('tone', 'backlog')
+                else:
+                    self.shed('tone', 'coalesced', pressure=False)
+                logger.info(f"Tone window {tone_window.seq} skipped (backlog)")
+                continue
+            kept.append((tone_window, task))
+        self.bs_tasks = kept
+
+    #Transcribe stage: Whisper on one utterance, send the result, queue GPT feedback
+    async def process_transcription_window(self, item):
+        seq, span, audio_chunk, dispatched_at = item
+        deadline = dispatched_at + self.transcript_deadline_s
+        if time.monotonic() >= deadline:
+            self.shed('transcribe', 'expired')
+            return
+        text = await self.transcriber.transcribe_chunk(audio_chunk, deadline)
+        if not text and time.monotonic() >= deadline:
+            self.shed('transcribe', 'deadline')
+            return
+        self.observe_freshness('transcribe', dispatched_at, self.transcript_deadline_s)
+
+        if text.strip():
+            logger.info(f"Transcription: {text}")
+            # Accumulate total transcript
+            cleaned = str(text).strip()
+            if cleaned:
+                self.total_transcript = (self.total_transcript + " " + cleaned)[-self.max_transcript_chars:]
+                self.record_segment(seq, span, 'transcript', text=cleaned)
+            llm_obj = self.assemble_llm_input(text)
+            # The newer segment makes any in-flight feedback obsolete
+            self.cancel_feedback()
+            dropped = self.feedback_queue.dropped
+            self.feedback_queue.put_nowait((seq, span, llm_obj, dispatched_at))
+            if self.feedback_queue.dropped > dropped:
+                self.shed('feedback', 'coalesced', pressure=False)
+            await self.send_frame(self.wire.transcript(
+                self.stream_id or 'unknown', seq, text, int(time.time() * 1000),
+                dict(self.tone_timeline.labels), self.bs_meta(), llm_obj,
+            ))
+            await self.save_state()
     
-    #Start BS processing for a 6s chunk and update latest results on completion.
-    async def process_bs_chunk(self, bs_chunk: np.ndarray, start_ts_ms: int, end_ts_ms: int):
+    #BS analysis of one tone window (at most tone_max_in_flight per stream); the outcome is
+    #committed to the timeline whether it succeeded, failed or was skipped
+    async def process_tone_window(self, tone_window, bs_chunk: AudioSegment, deadline: float):
+        status = tone_timeline.FAILED
+        labels = None
         try:
-            await self.tone_analyzer.analyze_chunk(bs_chunk)
-
-            # Send BS results to client console (frontend) 
-            try:
-                await self.websocket.send(json.dumps({
-                    'type': 'bs_update',
-                    'chunk': {
-                        'start_ms': start_ts_ms,
-                        'end_ms': end_ts_ms,
-                    },
-                    'feedback': dict(self.tone_analyzer.last_feedback or {}),
-                    'behavioral_signals': {
-                        'client_id': self.tone_analyzer.client_id,
-                        'endpoint': self.tone_analyzer.endpoint,
-                        'status_code': self.tone_analyzer.last_status_code,
-                        'duration_ms': self.tone_analyzer.last_duration_ms,
-                        'raw': self.tone_analyzer.last_raw_response,
-                    },
-                }))
-            except Exception as send_err:
-                logger.warning(f"Failed to send bs_update to client: {send_err}")
+            async with self.tone_slots:
+                if time.monotonic() >= deadline:
+                    status = tone_timeline.SKIPPED
+                    self.shed('tone', 'expired')
+                    return
+                tone_window.started = True
+                results = await self.tone_analyzer.analyze_chunk(bs_chunk, deadline)
+            if not results and time.monotonic() >= deadline:
+                status = tone_timeline.SKIPPED
+                self.shed('tone', 'deadline')
+            elif results:
+                self.observe_freshness('tone', deadline - self.bs_stale_after_s, self.bs_stale_after_s)
+                # This window's own labels, not the analyzer's shared latest-result dict
+                labels = {task: label for task, label, _ in iter_final_labels(results)}
+                status = tone_timeline.OK
+        except asyncio.CancelledError:
+            status = tone_timeline.SKIPPED
+            raise
         except Exception as e:
+            metrics.inc("resonate_stage_errors_total", stage="bs")
             logger.warning(f"BS processing error: {e}")
+        finally:
+            self.resolve_tone_window(tone_window, status, labels)
+
+    #Record a window's outcome (first outcome wins) and commit whatever that unblocks, in order
+    def resolve_tone_window(self, tone_window, status: str, labels: dict = None):
+        for committed in self.tone_timeline.resolve(tone_window, status, labels):
+            self.commit_tone_window(committed)
 
-    #Merge Whisper transcription and BS tone analysis into a single JSON 
-    def assemble_llm_input(self, transcript_text: str) -> dict:
+    #A window reached the timeline in order: log it and queue its bs_update frame
+    def commit_tone_window(self, tone_window):
+        metrics.inc("resonate_tone_windows_total", status=tone_window.status)
+        if tone_window.status != tone_timeline.OK:
+            return
+        self.record_segment(tone_window.segment_seq, tone_window.segment_span, 'tone', labels=tone_window.labels,
+                            window=tone_window.seq, window_start_ms=tone_window.start_ms,
+                            window_end_ms=tone_window.end_ms)
+        self.tone_queue.put_nowait(tone_window)
+
+    #Tone stage: send one committed window to the client (labels as of that window)
+    async def send_tone_window(self, tone_window):
+        try:
+            await self.send_frame(self.wire.tone(
+                tone_window.segment_seq, tone_window.seq, tone_window.start_ms, tone_window.end_ms,
+                tone_window.merged, self.bs_meta(),
+            ))
+        except Exception as send_err:
+            logger.warning(f"Failed to send bs_update to client: {send_err}")
+
+    #Merge Whisper transcription and BS tone analysis into a single JSON.
+    #voice_analysis / prosody default to the stream's latest results (batch mode passes the segment's own)
+    def assemble_llm_input(self, transcript_text: str, voice_analysis: dict = None, prosody: dict = None) -> dict:
+
+        if voice_analysis is None:
+            voice_analysis = dict(self.tone_timeline.labels)
+        if prosody is None:
+            prosody = dict(self.prosody.latest or {})
+        # Bounded history (summary + recent segments + recent feedback), built before this segment joins it
+        context = self.llm_context.build()
+        self.llm_context.add_segment(transcript_text, voice_analysis)
 
         # Construct unified payload
         # TODO: Include raw prediction scores in the payload
@@ -230,13 +697,85 @@ class WebSocketProcessor:
 	        "user_intent": self.user_intent,
             "user_purpose": self.user_purpose,
             "audience_type": self.user_audience,
-            "total_transcript": self.total_transcript,
-            "gpt_responses": list(self.gpt_responses),
-            "voice_analysis": self.tone_analyzer.last_feedback,
+            "voice_analysis": voice_analysis,
+            # Local pitch / loudness / pace / pause metrics over the last few seconds
+            "prosody": prosody,
+            "context": context,
         }
 
         return llm_payload
 
+    #Update the in-memory segment and append the same record to the durable segment log
+    def record_segment(self, seq: int, span: tuple, kind: str, **fields):
+        record = {
+            'seq': seq,
+            'kind': kind,
+            'start_ms': span[0],
+            'end_ms': span[1],
+            'ts_ms': int(time.time() * 1000),
+            **fields,
+        }
+        segment = self.segments.get(seq)
+        if segment is not None:
+            segment.apply(record)
+        if past_speech_sessions.segment_log is not None:
+            past_speech_sessions.segment_log.append(self.session_id or 'unknown', record)
+
+    #Conversation state that must survive this process (reconnects may land on another worker)
+    def snapshot_state(self) -> dict:
+        return {
+            'stream_id': self.stream_id,
+            'user_intent': self.user_intent,
+            'user_purpose': self.user_purpose,
+            'audience_type': self.user_audience,
+            'total_transcript': self.total_transcript,
+            'gpt_responses': list(self.gpt_responses),
+            'llm_context': self.llm_context.to_dict(),
+            'updated_ms': int(time.time() * 1000),
+        }
+
+    def state_key(self) -> str:
+        return f"stream:{self.stream_id or 'unknown'}"
+
+    async def save_state(self):
+        async with self.state_lock:
+            if self.state_closed:
+                return
+            await past_speech_sessions.sessions.save(self.state_key(), self.snapshot_state())
+
+    #A completed stream has nothing to resume; abandoned ones expire (SESSION_STATE_TTL_S)
+    async def delete_state(self):
+        async with self.state_lock:
+            self.state_closed = True
+            await past_speech_sessions.sessions.remove(self.state_key())
+
+    #Resume a previous connection's conversation for this stream_id, if any was saved
+    async def restore_state(self) -> bool:
+        state = await past_speech_sessions.sessions.load(self.state_key())
+        if not state:
+            return False
+        self.total_transcript = state.get('total_transcript', '')[-self.max_transcript_chars:]
+        self.gpt_responses = deque(state.get('gpt_responses', []), maxlen=self.gpt_responses.maxlen)
+        self.llm_context.restore(state.get('llm_context') or {})
+        logger.info(f"Stream {self.stream_id} resumed from saved state")
+        return True
+
+    #Let queued audio finish processing, then confirm completion to the client
+    async def complete_stream(self):
+        # Flush marker: the decode stage emits the trailing utterance in order with queued audio
+        self.ingest_queue.put_nowait(None)
+        await self.pipeline.drain(timeout=self.stream_drain_timeout_s)
+        # Tone windows of the last utterances, then the bs_update frames they commit
+        pending = [task for _, task in self.bs_tasks if not task.done()]
+        if pending:
+            await asyncio.wait(pending, timeout=self.stream_drain_timeout_s)
+            await self.pipeline.drain(timeout=self.stream_drain_timeout_s)
+        await self.delete_state()
+        try:
+            await self.send_frame(self.wire.complete())
+        except Exception as e:
+            logger.warning(f"Failed to send stream_complete: {e}")
+
     #Handle incoming WebSocket message
     async def handle_message(self, message):
         try:
@@ -248,9 +787,8 @@ class WebSocketProcessor:
                     binary_data = message
                 else:
                     binary_data = bytes(message)
-                result = await self.process_audio_bytes(binary_data)
-                if result:
-                    await self.websocket.send(json.dumps(result))
+                # Ingest: enqueue only, never wait on decoding or upstream calls
+                self.ingest_queue.put_nowait(binary_data)
                 return
 
             # Text frames: JSON control or legacy payloads
@@ -259,17 +797,25 @@ class WebSocketProcessor:
             # Control: 
             if isinstance(payload, dict) and payload.get('type') == 'stream_start':
                 self.stream_id = payload.get('stream_id', 'unknown')
-                self.sample_rate = int(payload.get('sample_rate', 16000))
+                # Segment log key: clients reuse stream ids, and segment seqs restart every connection
+                self.session_id = f"{self.stream_id}-{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}"
+                logger.info(f"Stream {self.stream_id} logging to session {self.session_id}")
+                self.input_sample_rate = int(payload.get('sample_rate', 16000))
+                self.resampler = PolyphaseResampler(self.input_sample_rate, self.sample_rate)
                 self.user_intent = payload.get('user_intent')
                 self.user_purpose = payload.get('user_purpose')
                 self.user_audience = payload.get('audience_type')
+                self.stream_feedback = bool(payload.get('feedback_stream', self.stream_feedback))
+                self.wire = wire_protocol.negotiate(payload)
+                await self.send_frame(self.wire.hello())
+                # Reconnecting clients can pick up where they left off (possibly on another worker)
+                if payload.get('resume'):
+                    await self.restore_state()
             
             # Handle stream end signal
             if isinstance(payload, dict) and payload.get('type') == 'stream_end':
-                await self.websocket.send(json.dumps({
-                    'type': 'stream_complete',
-                    'message': 'Audio stream processing complete'
-                }))
+                if self.complete_task is None or self.complete_task.done():
+                    self.complete_task = asyncio.create_task(self.complete_stream())
                 return
                      
         except json.JSONDecodeError:
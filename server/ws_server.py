@@ -1,24 +1,53 @@
+import argparse
 import asyncio
+import os
+import signal
 import websockets
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
 import numpy as np
 import logging
 
 from whisp_adapter import Transcriber
-from bs_adapter import ToneAnalyzer
+from bs_adapter import ToneAnalyzer, close_http_session
 from ws_processor import WebSocketProcessor
+from worker_supervisor import Supervisor
+import metrics
+import openai_client
+import past_speech_sessions
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Open client connections in this process (reported to the supervisor, used for draining)
+active_connections = 0
+HEARTBEAT_INTERVAL_S = 1.0
+DRAIN_TIMEOUT_S = float(os.getenv("WS_DRAIN_TIMEOUT_S", "30"))
+# permessage-deflate sized for small frames: a 2KB window and low memLevel keep per-connection
+# compressor memory at ~10KB instead of ~320KB, with about the same ratio on short JSON
+DEFLATE_WINDOW_BITS = int(os.getenv("WS_DEFLATE_WINDOW_BITS", "11"))
+DEFLATE_MEM_LEVEL = int(os.getenv("WS_DEFLATE_MEM_LEVEL", "4"))
+
+
+def deflate_extensions():
+    return [ServerPerMessageDeflateFactory(
+        server_max_window_bits=DEFLATE_WINDOW_BITS,
+        client_max_window_bits=DEFLATE_WINDOW_BITS,
+        compress_settings={"memLevel": DEFLATE_MEM_LEVEL},
+    )]
+
 async def handler(websocket):
+    global active_connections
     logger.info(f"Client connected: {websocket.remote_address}")
+    active_connections += 1
+    processor = None
     try:
 
         transcriber = Transcriber()
         tone_analyzer = ToneAnalyzer()
         processor = WebSocketProcessor(websocket, transcriber, tone_analyzer)
+        processor.start()
 
-        # Process messages
+        # Process messages (frames are only enqueued; pipeline stages run independently)
         async for message in websocket:
             await processor.handle_message(message)
 
@@ -26,14 +55,83 @@ async def handler(websocket):
         logger.info("Client disconnected")
     except Exception as e:
         logger.error(f"Error in handler: {e}")
+    finally:
+        active_connections -= 1
+        if processor is not None:
+            await processor.close()
 
-async def main():
+async def main(host: str = "localhost", port: int = 8766):
     logger.info("Starting WebSocket server...")
 
-    async with websockets.serve(handler, "localhost", 8766):
-        logger.info("WebSocket server started on ws://localhost:8766")
-        logger.info("Ready to receive audio streams")
-        await asyncio.Future() 
+    metrics_runner = await metrics.start_server()
+    try:
+        async with websockets.serve(handler, host, port, extensions=deflate_extensions()):
+            logger.info(f"WebSocket server started on ws://{host}:{port}")
+            logger.info("Ready to receive audio streams")
+            await asyncio.Future()
+    finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await close_http_session()
+        await openai_client.close_client()
+        if past_speech_sessions.segment_log is not None:
+            await past_speech_sessions.segment_log.close()
+
+#Report liveness and load to the supervisor until cancelled
+async def heartbeat(slot, slots):
+    while True:
+        slots.heartbeat(slot, active_connections)
+        await asyncio.sleep(HEARTBEAT_INTERVAL_S)
+
+#One worker process: shares the listening port with its siblings (SO_REUSEPORT) and
+#drains on SIGTERM: stop accepting, let open streams finish, then exit
+async def serve_worker(slot, slots, host: str, port: int):
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    loop.add_signal_handler(signal.SIGTERM, lambda: stop.done() or stop.set_result(None))
+
+    beat = asyncio.create_task(heartbeat(slot, slots))
+    # Each worker exposes its own metrics on METRICS_PORT + slot
+    metrics_runner = await metrics.start_server(metrics.PORT + slot)
+    server = await websockets.serve(handler, host, port, extensions=deflate_extensions(), reuse_port=True)
+    logger.info(f"Worker {slot} (pid={os.getpid()}) serving ws://{host}:{port}")
+    try:
+        await stop
+        logger.info(f"Worker {slot} draining {active_connections} connection(s)")
+        server.close(close_connections=False)
+        deadline = loop.time() + DRAIN_TIMEOUT_S
+        while active_connections > 0 and loop.time() < deadline:
+            await asyncio.sleep(0.2)
+            slots.heartbeat(slot, active_connections)
+    finally:
+        beat.cancel()
+        server.close()
+        await server.wait_closed()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await close_http_session()
+        await openai_client.close_client()
+        if past_speech_sessions.segment_log is not None:
+            await past_speech_sessions.segment_log.close()
+    logger.info(f"Worker {slot} stopped")
+
+def run_worker(slot, slots, host: str, port: int):
+    # Ctrl+C goes to the whole process group; only the supervisor reacts to it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    asyncio.run(serve_worker(slot, slots, host, port))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Resonate WebSocket server")
+    parser.add_argument("--host", default=os.getenv("WS_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("WS_PORT", "8766")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WS_WORKERS", "1")),
+                        help="worker processes sharing the port (SO_REUSEPORT); 1 = single process")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        supervisor = Supervisor(lambda slot, slots: run_worker(slot, slots, args.host, args.port),
+                                args.workers, drain_timeout_s=DRAIN_TIMEOUT_S)
+        supervisor.run()
+    else:
+        asyncio.run(main(args.host, args.port))